@@ -40,6 +40,7 @@ class WorkloadConfig:
     wallets: int
     transactions_per_wallet: int
     transaction_interval: float
+    transaction_size_distribution: Optional[Dict[str, Any]] = None
     
     @classmethod
     def from_json(cls, json_data: Dict[str, Any]):
@@ -48,7 +49,25 @@ class WorkloadConfig:
             description=json_data["description"],
             wallets=json_data["wallets"],
             transactions_per_wallet=json_data["transactions_per_wallet"],
-            transaction_interval=json_data["transaction_interval"]
+            transaction_interval=json_data["transaction_interval"],
+            transaction_size_distribution=json_data.get("transaction_size_distribution")
+        )
+
+@dataclass
+class ScenarioConfig:
+    name: str
+    description: str
+    workload: WorkloadConfig
+    
+    @classmethod
+    def from_json(cls, json_data: Dict[str, Any]):
+        workload_data = dict(json_data["workload"])
+        workload_data.setdefault("name", json_data["name"])
+        workload_data.setdefault("description", json_data["description"])
+        return cls(
+            name=json_data["name"],
+            description=json_data["description"],
+            workload=WorkloadConfig.from_json(workload_data)
         )
 
 class ConfigLoader:
@@ -124,4 +143,14 @@ class ConfigLoader:
         
         with open(workload_file, 'r') as f:
             data = json.load(f)
-        return WorkloadConfig.from_json(data)
\ No newline at end of file
+        return WorkloadConfig.from_json(data)
+    
+    def load_scenario_config(self, scenario: str) -> ScenarioConfig:
+        """Load a network scenario (e.g. stress_test) from JSON files"""
+        scenario_file = os.path.join(self.config_dir, "network", f"{scenario.lower()}.json")
+        if not os.path.exists(scenario_file):
+            raise FileNotFoundError(f"Scenario config not found: {scenario_file}")
+        
+        with open(scenario_file, 'r') as f:
+            data = json.load(f)
+        return ScenarioConfig.from_json(data)
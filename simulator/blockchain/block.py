@@ -1,31 +1,44 @@
 from dataclasses import dataclass
+from typing import Optional
 
-# Block structure: Each block has a header (1,024 bytes) + (# transactions × 256
-# bytes). Track block ID, timestamp, time-since-last-block, transaction count, and size.
-@dataclass
+HEADER_SIZE_BYTES = 1024
+
+# Block structure: Each block has a header (1,024 bytes) + the sum of its
+# transaction sizes (256 bytes each unless drawn from a size distribution).
+# Track block ID, timestamp, time-since-last-block, transaction count, and size.
+@dataclass(slots=True)
 class Header:
     block_id: int
     parent_block_id: int
     timestamp: int
     time_since_last_block: int
     transaction_count: int
-    size: int = 1024
+    size: int = HEADER_SIZE_BYTES
+    total_fees: float = 0.0
 
     merkle_root: str = ""
     difficulty_target: int = 0
     nonce: int = 0
 
 
-    def update_size(self, transactions_count, tx_size_bytes=256):
+    def update_size(self, transactions_count, tx_size_bytes=256, transactions_bytes=None):
         """Update size based on header + transaction sizes"""
-        self.size = 1024 + (transactions_count * tx_size_bytes)
+        if transactions_bytes is None:
+            transactions_bytes = transactions_count * tx_size_bytes
+        self.size = HEADER_SIZE_BYTES + transactions_bytes
         self.transaction_count = transactions_count
 
 
-@dataclass
+@dataclass(slots=True)
 class Block: 
     header: Header          # should be 1 mb
-    transactions: list      # each transaction should be 256 bytes
+    # None for headers-only blocks, whose header already holds the
+    # transaction count, fees and size
+    transactions: Optional[list] = None
 
     def __post_init__(self):
-        self.header.update_size(len(self.transactions))
\ No newline at end of file
+        if self.transactions is not None:
+            self.header.update_size(
+                len(self.transactions),
+                transactions_bytes=sum(tx.size for tx in self.transactions)
+            )
\ No newline at end of file
@@ -0,0 +1,248 @@
+import os
+import queue
+import struct
+import threading
+import numpy as np
+from collections import deque
+from typing import Iterator, Tuple
+
+from simulator.blockchain.block import Block
+
+# Block file layout: FILE_MAGIC, then per block one HEADER_DTYPE record
+# followed by transaction_count TRANSACTION_DTYPE records. All fields are
+# little-endian and fixed width, so the file can be read with np.frombuffer.
+# Files of headers-only blocks start with HEADERS_FILE_MAGIC and have no
+# transaction records.
+FILE_MAGIC = b"SIMBLK01"
+HEADERS_FILE_MAGIC = b"SIMBLH01"
+HEADER_DTYPE = np.dtype([
+    ("block_id", "<i8"),
+    ("parent_block_id", "<i8"),
+    ("timestamp", "<i8"),
+    ("time_since_last_block", "<f8"),
+    ("transaction_count", "<u4"),
+    ("size", "<u8"),
+    ("total_fees", "<f8"),
+])
+TRANSACTION_DTYPE = np.dtype([
+    ("transaction_id", "<u8"),
+    ("sender", "<i8"),
+    ("receiver", "<i8"),
+    ("amount", "<f8"),
+    ("fee", "<f8"),
+    ("timestamp", "<i8"),
+    ("size", "<u4"),
+])
+# PATH.hdr: INDEX_MAGIC, then one INDEX_DTYPE record per block in append
+# order (the height), with the offset of its transactions in the block file
+INDEX_MAGIC = b"SIMHDR01"
+INDEX_DTYPE = np.dtype(HEADER_DTYPE.descr + [("body_offset", "<u8")])
+# PATH.txi: TX_INDEX_MAGIC, then TX_INDEX_DTYPE records sorted by id
+TX_INDEX_MAGIC = b"SIMTXI01"
+TX_INDEX_DTYPE = np.dtype([("transaction_id", "<u8"), ("height", "<u8")])
+# Records copied per write when sorting PATH.txi.tmp into PATH.txi
+TX_INDEX_CHUNK = 1 << 20
+# Per-block records are packed with struct, which is cheaper than building
+# one-element arrays
+_HEADER_STRUCT = struct.Struct("<qqqdIQd")
+_INDEX_STRUCT = struct.Struct("<qqqdIQdQ")
+assert _HEADER_STRUCT.size == HEADER_DTYPE.itemsize and _INDEX_STRUCT.size == INDEX_DTYPE.itemsize
+FLUSH_BYTES = 4 << 20
+PENDING_FLUSHES = 4
+# Seconds between checks that the writer thread is alive while the queue is full
+WRITER_POLL_SECONDS = 1.0
+
+class BlockSink:
+    """Destination of finished blocks.
+
+    len() counts every block appended so far and recent holds the blocks
+    still in memory, newest last.
+    """
+
+    def __init__(self):
+        self.recent = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, block: Block):
+        self.recent.append(block)
+        self._count += 1
+
+    def close(self):
+        pass
+
+
+class MemoryBlockSink(BlockSink):
+    """Keeps every block in memory"""
+
+
+class HeaderBlockSink(BlockSink):
+    """Keeps every header as a HEADER_DTYPE record and a recent window of blocks"""
+
+    def __init__(self, window=100):
+        super().__init__()
+        self.recent = deque(maxlen=max(1, window))
+        self._headers = np.empty(1024, dtype=HEADER_DTYPE)
+
+    def append(self, block: Block):
+        if self._count == len(self._headers):
+            headers = np.empty(2 * len(self._headers), dtype=HEADER_DTYPE)
+            headers[:self._count] = self._headers
+            self._headers = headers
+        self._headers[self._count] = _header_fields(block)
+        super().append(block)
+
+    @property
+    def headers(self) -> np.ndarray:
+        return self._headers[:self._count]
+
+
+class FileBlockSink(BlockSink):
+    """Appends blocks to a binary block file and keeps only a recent window.
+
+    Next to the block file it writes PATH.hdr, the fixed-width header index,
+    and on close PATH.txi, the transaction index; ChainArchive reads them.
+    Encoded records are buffered until flush_bytes accumulate, then handed
+    to a writer thread, so the simulation only waits on disk when more than
+    PENDING_FLUSHES flushes are queued. An error in the writer thread is
+    raised again from the next flush or close.
+    """
+
+    def __init__(self, path, window=100, flush_bytes=FLUSH_BYTES, headers_only=False):
+        super().__init__()
+        self.path = path
+        self.headers_only = headers_only
+        self.recent = deque(maxlen=max(1, window))
+        self.flush_bytes = flush_bytes
+        self.bytes_written = 0
+        self._block_file = open(path, "wb")
+        self._index_file = open(path + ".hdr", "wb")
+        # Unsorted (transaction id, height) pairs, sorted into PATH.txi on close
+        self._tx_file = open(path + ".txi.tmp", "wb")
+        magic = HEADERS_FILE_MAGIC if headers_only else FILE_MAGIC
+        self._buffers = {self._block_file: [magic], self._index_file: [INDEX_MAGIC], self._tx_file: []}
+        self._buffered = len(FILE_MAGIC) + len(INDEX_MAGIC)
+        self._offset = len(FILE_MAGIC)
+        self._queue = queue.Queue(maxsize=PENDING_FLUSHES)
+        self._error = None  # exception that stopped the writer thread
+        self._writer = threading.Thread(target=self._write_loop, name="block-sink", daemon=True)
+        self._writer.start()
+
+    def append(self, block: Block):
+        height = len(self)
+        super().append(block)
+        fields = _header_fields(block)
+        transactions = encode_transactions(() if self.headers_only else block.transactions)
+        records = [(self._block_file, _HEADER_STRUCT.pack(*fields)),
+                   (self._index_file, _INDEX_STRUCT.pack(*fields, self._offset + HEADER_DTYPE.itemsize))]
+        if len(transactions):
+            tx_index = np.empty(len(transactions), dtype=TX_INDEX_DTYPE)
+            tx_index["transaction_id"] = transactions["transaction_id"]
+            tx_index["height"] = height
+            records += [(self._block_file, transactions.tobytes()), (self._tx_file, tx_index.tobytes())]
+        for file, data in records:
+            self._buffers[file].append(data)
+            self._buffered += len(data)
+        self._offset += HEADER_DTYPE.itemsize + transactions.nbytes
+        if self._buffered >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        """Queue the buffered records for writing"""
+        for file, chunks in self._buffers.items():
+            if chunks:
+                self._put((file, b"".join(chunks)))
+                chunks.clear()
+        self.bytes_written += self._buffered
+        self._buffered = 0
+
+    def close(self):
+        if self._block_file.closed:
+            return
+        try:
+            self.flush()
+            self._put(None)
+            self._writer.join()
+        finally:
+            for file in self._buffers:
+                file.close()
+        self._check_writer()
+        write_transaction_index(self.path)
+
+    def _put(self, item):
+        # A bounded put would block forever once the writer is gone
+        while True:
+            self._check_writer()
+            try:
+                self._queue.put(item, timeout=WRITER_POLL_SECONDS)
+                return
+            except queue.Full:
+                pass
+
+    def _check_writer(self):
+        if self._error is not None:
+            raise RuntimeError(f"Block file writer failed: {self._error}") from self._error
+        if not self._writer.is_alive() and not self._block_file.closed:
+            raise RuntimeError("Block file writer stopped")
+
+    def _write_loop(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                file, data = item
+                file.write(data)
+        except Exception as error:
+            self._error = error
+
+
+def _header_fields(block: Block):
+    header = block.header
+    return (header.block_id, header.parent_block_id, header.timestamp,
+            header.time_since_last_block, header.transaction_count, header.size,
+            header.total_fees)
+
+def encode_transactions(transactions) -> np.ndarray:
+    """TRANSACTION_DTYPE records of a block's transactions"""
+    return np.fromiter(
+        ((tx.transaction_id, tx.sender, tx.receiver, tx.amount, tx.fee, tx.timestamp, tx.size)
+         for tx in transactions),
+        dtype=TRANSACTION_DTYPE, count=len(transactions))
+
+
+def write_transaction_index(path):
+    """Sort the (transaction id, height) pairs of PATH.txi.tmp into PATH.txi
+
+    The pairs stay memory-mapped: only their sort order is held in memory,
+    and the sorted records are written TX_INDEX_CHUNK at a time.
+    """
+    temporary = path + ".txi.tmp"
+    count = os.path.getsize(temporary) // TX_INDEX_DTYPE.itemsize
+    with open(path + ".txi", "wb") as file:
+        file.write(TX_INDEX_MAGIC)
+        if count:
+            pairs = np.memmap(temporary, dtype=TX_INDEX_DTYPE, mode="r", shape=(count,))
+            order = np.argsort(pairs["transaction_id"], kind="stable")
+            for start in range(0, count, TX_INDEX_CHUNK):
+                file.write(pairs[order[start:start + TX_INDEX_CHUNK]].tobytes())
+            del pairs
+    os.remove(temporary)
+
+
+def read_block_file(path) -> Iterator[Tuple[np.void, np.ndarray]]:
+    """Yield (header record, transaction records) for every block in a block file"""
+    with open(path, "rb") as file:
+        data = memoryview(file.read())
+    magic = bytes(data[:len(FILE_MAGIC)])
+    if magic not in (FILE_MAGIC, HEADERS_FILE_MAGIC):
+        raise ValueError(f"{path} is not a block file")
+    offset = len(FILE_MAGIC)
+    while offset < len(data):
+        header = np.frombuffer(data, HEADER_DTYPE, 1, offset)[0]
+        offset += HEADER_DTYPE.itemsize
+        count = int(header["transaction_count"]) if magic == FILE_MAGIC else 0
+        yield header, np.frombuffer(data, TRANSACTION_DTYPE, count, offset)
+        offset += count * TRANSACTION_DTYPE.itemsize
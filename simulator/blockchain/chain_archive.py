@@ -0,0 +1,79 @@
+import os
+import numpy as np
+from typing import Optional
+
+from simulator.blockchain.block_sink import (
+    FILE_MAGIC, HEADERS_FILE_MAGIC, INDEX_DTYPE, INDEX_MAGIC, TRANSACTION_DTYPE, TX_INDEX_DTYPE, TX_INDEX_MAGIC
+)
+
+class ChainArchive:
+    """Read-only queries over a block file written by FileBlockSink.
+
+    The block file, its header index (PATH.hdr) and its transaction index
+    (PATH.txi) are memory-mapped, and every result is a view into them:
+    headers by height are O(1), time ranges and transaction ids are binary
+    searches, and a block's transactions are a slice of the block file.
+    Heights count blocks in the order they were appended, from 0. Archives
+    of headers-only blocks have no transactions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.headers_only = file.read(len(HEADERS_FILE_MAGIC)) == HEADERS_FILE_MAGIC
+        self.data = _map(path, np.uint8, HEADERS_FILE_MAGIC if self.headers_only else FILE_MAGIC)
+        self.headers = _map(path + ".hdr", INDEX_DTYPE, INDEX_MAGIC)
+        self.transaction_index = _map(path + ".txi", TX_INDEX_DTYPE, TX_INDEX_MAGIC)
+
+    def __len__(self):
+        return len(self.headers)
+
+
+    def header(self, height) -> np.void:
+        return self.headers[height]
+
+    def transactions(self, height) -> np.ndarray:
+        """TRANSACTION_DTYPE records of the block at height"""
+        header = self.headers[height]
+        if self.headers_only:
+            return np.empty(0, dtype=TRANSACTION_DTYPE)
+        # self.data starts after the file magic
+        return np.frombuffer(self.data, TRANSACTION_DTYPE, int(header["transaction_count"]),
+                             int(header["body_offset"]) - len(FILE_MAGIC))
+
+
+    def heights_between(self, start, end) -> range:
+        """Heights of the blocks with start <= timestamp <= end"""
+        timestamps = self.headers["timestamp"]
+        return range(int(np.searchsorted(timestamps, start, side="left")),
+                     int(np.searchsorted(timestamps, end, side="right")))
+
+    def headers_between(self, start, end) -> np.ndarray:
+        heights = self.heights_between(start, end)
+        return self.headers[heights.start:heights.stop]
+
+
+    def height_of(self, transaction_id) -> Optional[int]:
+        """Height of the block that confirmed transaction_id, None if none did"""
+        ids = self.transaction_index["transaction_id"]
+        position = int(np.searchsorted(ids, np.uint64(transaction_id)))
+        if position < len(ids) and ids[position] == transaction_id:
+            return int(self.transaction_index["height"][position])
+        return None
+
+    def transaction(self, transaction_id) -> Optional[np.void]:
+        height = self.height_of(transaction_id)
+        if height is None:
+            return None
+        transactions = self.transactions(height)
+        return transactions[np.flatnonzero(transactions["transaction_id"] == transaction_id)[0]]
+
+
+def _map(path, dtype, magic):
+    """Memory-map the records after magic, or an empty array for a file without records"""
+    with open(path, "rb") as file:
+        if file.read(len(magic)) != magic:
+            raise ValueError(f"{path} does not start with {magic!r}")
+    if os.path.getsize(path) == len(magic):
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=len(magic))
@@ -0,0 +1,68 @@
+import math
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+# Fee rates are bucketed on a log scale from MIN_FEE_RATE (coins per byte,
+# 1 satoshi/byte) upwards, each bucket FEE_RATE_SPACING times the previous
+# one, like Bitcoin Core's fee estimator.
+MIN_FEE_RATE = 1e-8
+FEE_RATE_SPACING = 1.1
+FEE_RATE_BUCKETS = 200
+_LOG_MIN_FEE_RATE = math.log(MIN_FEE_RATE)
+_BUCKETS_PER_LOG = 1 / math.log(FEE_RATE_SPACING)
+
+@dataclass
+class FeeRateHistogram:
+    """Pending bytes and transaction counts per fee-rate bucket"""
+    counts: List[int] = field(default_factory=lambda: [0] * FEE_RATE_BUCKETS)
+    sizes: List[int] = field(default_factory=lambda: [0] * FEE_RATE_BUCKETS)
+
+
+    def add(self, fee_rate, size, count=1):
+        bucket = self.bucket(fee_rate)
+        self.counts[bucket] += count
+        self.sizes[bucket] += size
+
+    def remove(self, fee_rate, size, count=1):
+        bucket = self.bucket(fee_rate)
+        self.counts[bucket] -= count
+        self.sizes[bucket] -= size
+
+    def clear(self):
+        self.counts = [0] * FEE_RATE_BUCKETS
+        self.sizes = [0] * FEE_RATE_BUCKETS
+
+
+    @staticmethod
+    def bucket(fee_rate):
+        if fee_rate <= MIN_FEE_RATE:
+            return 0
+        bucket = int((math.log(fee_rate) - _LOG_MIN_FEE_RATE) * _BUCKETS_PER_LOG)
+        return bucket if bucket < FEE_RATE_BUCKETS else FEE_RATE_BUCKETS - 1
+
+    @staticmethod
+    def bucket_floor(bucket):
+        return MIN_FEE_RATE * FEE_RATE_SPACING ** bucket
+
+
+    def estimate_fee_rate(self, target_blocks, block_bytes):
+        """Fee rate needed to be mined within target_blocks blocks.
+
+        Walks the buckets from the highest fee rate down until the pending
+        bytes above the walk fill target_blocks blocks of block_bytes; a new
+        transaction has to outbid that bucket. Returns MIN_FEE_RATE when the
+        pool would be cleared within the target.
+        """
+        capacity = max(1, target_blocks) * block_bytes
+        pending = 0
+        for bucket in range(FEE_RATE_BUCKETS - 1, -1, -1):
+            pending += self.sizes[bucket]
+            if pending >= capacity:
+                return self.bucket_floor(bucket + 1)
+        return MIN_FEE_RATE
+
+
+    def snapshot(self) -> List[Tuple[float, int, int]]:
+        """(fee rate floor, transactions, bytes) for every non-empty bucket"""
+        return [(self.bucket_floor(bucket), self.counts[bucket], self.sizes[bucket])
+                for bucket in range(FEE_RATE_BUCKETS) if self.counts[bucket]]
@@ -0,0 +1,56 @@
+import itertools
+
+# Accounts and transactions are identified by packed integers that fit a
+# signed 64-bit word, so they hash and compare as plain ints and can be
+# stored in NumPy int64 arrays. They are rendered as strings for output only.
+#
+#   account:     bits 0-29 index, bit 30 set for miner accounts
+#   transaction: account << 32 | per-account sequence number (32 bits)
+ACCOUNT_INDEX_BITS = 30
+MINER_ACCOUNT_FLAG = 1 << ACCOUNT_INDEX_BITS
+SEQUENCE_BITS = 32
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+# Account issuing transactions created without a sender sequence
+ANONYMOUS_ACCOUNT = MINER_ACCOUNT_FLAG - 1
+# Account of the transactions funding wallets in the UTXO model
+GENESIS_ACCOUNT = MINER_ACCOUNT_FLAG - 2
+
+_anonymous_sequence = itertools.count()
+
+
+def wallet_account(wallet_id):
+    return wallet_id
+
+def miner_account(miner_id):
+    return MINER_ACCOUNT_FLAG | miner_id
+
+def is_miner_account(account):
+    return account & MINER_ACCOUNT_FLAG != 0
+
+def account_name(account):
+    """String view of an account id: "7" for wallets, "miner_0" for miners"""
+    if account & MINER_ACCOUNT_FLAG:
+        return f"miner_{account & (MINER_ACCOUNT_FLAG - 1)}"
+    return str(account)
+
+
+def transaction_id(account, sequence):
+    return account << SEQUENCE_BITS | sequence
+
+def anonymous_transaction_id():
+    return transaction_id(ANONYMOUS_ACCOUNT, next(_anonymous_sequence) & SEQUENCE_MASK)
+
+def outpoint(tx_id, vout):
+    """Compact outpoint: the transaction id shifted left by one output bit.
+
+    Transactions have at most two outputs (payment and change), so an
+    outpoint fits an unsigned 64-bit word.
+    """
+    return tx_id << 1 | vout
+
+def transaction_account(tx_id):
+    return tx_id >> SEQUENCE_BITS
+
+def transaction_name(tx_id):
+    """String view of a transaction id: "<account>-<sequence>" """
+    return f"{account_name(tx_id >> SEQUENCE_BITS)}-{tx_id & SEQUENCE_MASK}"
@@ -0,0 +1,78 @@
+import numpy as np
+
+# Blocks a node can hold out of order beyond its high-water mark
+WINDOW_BITS = 64
+_ALL_ONES = np.uint64(2 ** 64 - 1)
+
+class BlockInventory:
+    """Which block ids every node has, in 16 bytes per node.
+
+    A node has all blocks up to high_water[node] and, of the WINDOW_BITS
+    ids after it, those whose bit is set in window[node] (bit 0 is
+    high_water + 1). A block arriving more than WINDOW_BITS ids ahead slides
+    the window forward, and the ids sliding out count as received: they are
+    too old to matter for propagation. Lookups and updates are O(1) per
+    node, and receive_many updates a whole set of nodes at once.
+    """
+
+    def __init__(self, node_count):
+        self.high_water = np.zeros(node_count, dtype=np.int64)
+        self.window = np.zeros(node_count, dtype=np.uint64)
+
+
+    def has_block(self, node, block_id) -> bool:
+        offset = block_id - int(self.high_water[node]) - 1
+        if offset < 0:
+            return True
+        return offset < WINDOW_BITS and int(self.window[node]) >> offset & 1 == 1
+
+    def receive(self, node, block_id) -> bool:
+        """Add block_id to a node's inventory; False if it had the block already"""
+        high_water = int(self.high_water[node])
+        offset = block_id - high_water - 1
+        if offset < 0:
+            return False
+        window = int(self.window[node])
+        if offset >= WINDOW_BITS:
+            shift = offset - WINDOW_BITS + 1
+            high_water += shift
+            window >>= shift
+            offset = WINDOW_BITS - 1
+        if window >> offset & 1:
+            return False
+        window |= 1 << offset
+        # Advance over the run of received blocks after the high-water mark
+        run = (~window & (window + 1)).bit_length() - 1
+        self.high_water[node] = high_water + run
+        self.window[node] = window >> run
+        return True
+
+    def receive_many(self, nodes: np.ndarray, block_id) -> np.ndarray:
+        """Vectorized receive for an array of distinct nodes; mask of the nodes the block was new to"""
+        high_water = self.high_water[nodes]
+        window = self.window[nodes]
+        offset = block_id - high_water - 1
+        shift = np.maximum(offset - (WINDOW_BITS - 1), 0)
+        high_water += shift
+        window = _shift_right(window, shift)
+        offset -= shift
+        fresh = offset >= 0
+        bits = np.left_shift(np.uint64(1), np.maximum(offset, 0).astype(np.uint64))
+        fresh &= (window & bits) == 0
+        window = np.where(fresh, window | bits, window)
+        # Trailing ones of the window: the lowest zero bit is 2 ** run
+        lowest_zero = ~window & (window + np.uint64(1))
+        run = np.where(lowest_zero == 0, WINDOW_BITS, np.frexp(lowest_zero.astype(np.float64))[1] - 1)
+        self.high_water[nodes] = high_water + run
+        self.window[nodes] = _shift_right(window, run)
+        return fresh
+
+    def nbytes(self):
+        return self.high_water.nbytes + self.window.nbytes
+
+
+def _shift_right(window, shift):
+    """window >> shift for uint64 arrays, 0 for shifts of WINDOW_BITS or more"""
+    shift = np.asarray(shift, dtype=np.int64)
+    shifted = np.right_shift(window, np.minimum(shift, WINDOW_BITS - 1).astype(np.uint64))
+    return np.where(shift >= WINDOW_BITS, np.uint64(0), shifted)
@@ -0,0 +1,107 @@
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict
+
+from simulator.blockchain.ids import MINER_ACCOUNT_FLAG
+
+@dataclass
+class Ledger:
+    """Balances of all wallet and miner accounts in NumPy arrays.
+
+    Wallets occupy slots 0..wallet_count-1 and miners the slots after them,
+    so a wallet's slot is its account id. The ledger lives for the whole
+    run: blocks are applied with a few vectorized operations and miner
+    balances accumulate across blocks.
+    """
+    wallet_count: int
+    miner_count: int
+    starting_balance: float = 0.0
+
+    balances: np.ndarray = field(init=False, repr=False)
+    nonces: np.ndarray = field(init=False, repr=False)  # transactions sent
+    fees_paid: np.ndarray = field(init=False, repr=False)
+    parked: np.ndarray = field(init=False, repr=False)
+    # slot -> SimPy event a parked wallet waits on for funds
+    _wake_events: Dict[int, object] = field(default_factory=dict, repr=False)
+
+
+    def __post_init__(self):
+        accounts = self.wallet_count + self.miner_count
+        self.balances = np.zeros(accounts)
+        self.balances[:self.wallet_count] = self.starting_balance
+        self.nonces = np.zeros(accounts, dtype=np.int64)
+        self.fees_paid = np.zeros(accounts)
+        self.parked = np.zeros(accounts, dtype=bool)
+
+
+    def slot(self, account):
+        if account & MINER_ACCOUNT_FLAG:
+            return self.wallet_count + (account & (MINER_ACCOUNT_FLAG - 1))
+        return account
+
+    def slots(self, accounts):
+        """Vectorized slot for an int64 array of account ids"""
+        miners = (accounts & MINER_ACCOUNT_FLAG) != 0
+        if not miners.any():
+            return accounts
+        return np.where(miners, self.wallet_count + (accounts & (MINER_ACCOUNT_FLAG - 1)), accounts)
+
+
+    def debit(self, slot, amount, fee):
+        """Charge a sent transaction to its sender.
+
+        Returns the inputs the transaction spends, None in the account model.
+        """
+        self.balances[slot] -= amount + fee
+        self.fees_paid[slot] += fee
+        self.nonces[slot] += 1
+        return None
+
+    def refund(self, slot, transaction):
+        """Return a dropped transaction's funds to its sender"""
+        self.balances[slot] += transaction.amount + transaction.fee
+        self.fees_paid[slot] -= transaction.fee
+        if self.parked[slot]:
+            self._wake(slot)
+
+    def credit(self, slot, amount):
+        self.balances[slot] += amount
+        if self.parked[slot]:
+            self._wake(slot)
+
+
+    def apply_block(self, transactions, miner_account, reward):
+        """Credit a block's receivers and pay its miner reward plus fees.
+
+        Senders were debited when they sent. Returns the block's fees.
+        """
+        count = len(transactions)
+        total_fees = 0.0
+        if count:
+            receivers = self.slots(np.fromiter((tx.receiver for tx in transactions), np.int64, count))
+            amounts = np.fromiter((tx.amount for tx in transactions), float, count)
+            total_fees = float(np.fromiter((tx.fee for tx in transactions), float, count).sum())
+            np.add.at(self.balances, receivers, amounts)
+            if self._wake_events:
+                for slot in np.unique(receivers[self.parked[receivers]]).tolist():
+                    self._wake(slot)
+        self.credit(self.slot(miner_account), reward + total_fees)
+        return total_fees
+
+
+    def park(self, slot, event):
+        """Wait on event until the next payment or refund to slot"""
+        self.parked[slot] = True
+        self._wake_events[slot] = event
+        return event
+
+    def _wake(self, slot):
+        self.parked[slot] = False
+        self._wake_events.pop(slot).succeed()
+
+
+    def miner_balances(self):
+        return self.balances[self.wallet_count:]
+
+    def parked_count(self):
+        return len(self._wake_events)
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
-from simulator.blockchain.block import Block, Header  # Fixed import
+from simulator.blockchain.block import Block, Header, HEADER_SIZE_BYTES  # Fixed import
 from simulator.blockchain.transaction_pool import Transaction_pool  # Fixed import
+from simulator.blockchain.ids import miner_account
 
 @dataclass
 class Miner:
@@ -10,31 +11,29 @@ class Miner:
     difficulty: int
     reward: float  # Changed to float for proper reward calculations
 
-    def mine_block(self, parent_block_id, pool, block_id, timestamp, blocksize, wallets_dict):
-        transactions = pool.transactions_limit(blocksize)
+    def mine_block(self, parent_block_id, pool, block_id, timestamp, blocksize, ledger, max_bytes=0, headers_only=False):
+        # Fill the block by fee rate up to blocksize transactions and, when
+        # max_bytes is set, up to max_bytes bytes including the header
+        tx_bytes = max(0, max_bytes - HEADER_SIZE_BYTES) if max_bytes else 0
+        transactions = pool.transactions_limit(blocksize, tx_bytes)
         
-        # Calculate total fees
-        total_fees = sum(tx.fee for tx in transactions)
-        total_reward = self.reward + total_fees
-        
-        # Process transactions - update wallet balances
-        for tx in transactions:
-            if tx.sender in wallets_dict and tx.receiver in wallets_dict:
-                sender_wallet = wallets_dict[tx.sender]
-                receiver_wallet = wallets_dict[tx.receiver]
-                receiver_wallet.receive_payment(tx.amount)
-        
-        # Miner gets block reward + fees
-        miner_wallet = wallets_dict.get(f"miner_{self.miner_id}")
-        if miner_wallet:
-            miner_wallet.receive_payment(total_reward)
+        # Credit receivers and pay the miner block reward + fees in one
+        # vectorized ledger update
+        total_fees = ledger.apply_block(transactions, miner_account(self.miner_id), self.reward)
         
         header = Header(
             block_id=block_id,
             parent_block_id=parent_block_id,
             timestamp=timestamp,
             time_since_last_block=0,
-            transaction_count=len(transactions)
+            transaction_count=len(transactions),
+            total_fees=total_fees
         )
-        block = Block(header=header, transactions=transactions)
-        return block, [transaction.transaction_id for transaction in transactions]
\ No newline at end of file
+        if headers_only:
+            # The block does not reference its transactions, which are
+            # released once the pool has retired them
+            header.update_size(len(transactions), transactions_bytes=sum(tx.size for tx in transactions))
+            block = Block(header=header)
+        else:
+            block = Block(header=header, transactions=transactions)
+        return block, transactions
\ No newline at end of file
@@ -1,28 +1,38 @@
 from dataclasses import dataclass
-from typing import Set, List
+from typing import List
+import numpy as np
 from simulator.blockchain.block import Block
+from simulator.blockchain.inventory import BlockInventory
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     """Network node implementation"""
     node_id: int
-    neighbors: Set[int]
-    stored_blocks: Set[int] = None
+    graph: object = None  # network Graph, CSR adjacency shared by all nodes
+    inventory: BlockInventory = None  # block ids of all nodes, shared
+    region: str = ""
     
     def __post_init__(self):
-        if self.stored_blocks is None:
-            self.stored_blocks = set()
+        # The inventory is sized for the whole network, which a node cannot know
+        if self.inventory is None:
+            raise ValueError(f"Node {self.node_id} needs the block inventory shared by all nodes")
+    
+    @property
+    def neighbors(self) -> np.ndarray:
+        if self.graph is None:
+            return np.empty(0, dtype=np.int32)
+        return self.graph.neighbors(self.node_id)
+    
+    def has_block(self, block_id) -> bool:
+        return self.inventory.has_block(self.node_id, block_id)
     
     def receive_block(self, block: Block, all_nodes: List['Node']) -> bool:
         """Receive and validate a new block"""
-        if block.header.block_id not in self.stored_blocks:
-            self.stored_blocks.add(block.header.block_id)
-            return True
-        return False
+        return self.inventory.receive(self.node_id, block.header.block_id)
     
     def broadcast_block(self, block: Block, all_nodes: List['Node']):
         """Broadcast block to neighbors"""
         for neighbor_id in self.neighbors:
             if neighbor_id < len(all_nodes):
                 neighbor = all_nodes[neighbor_id]
-                neighbor.receive_block(block, all_nodes)
\ No newline at end of file
+                neighbor.receive_block(block, all_nodes)
@@ -1,41 +1,471 @@
+import heapq
+import itertools
+from collections import deque
 from dataclasses import dataclass, field
-from typing import List, Set
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 from simulator.blockchain.transaction import Transaction
+from simulator.blockchain.fee_histogram import FeeRateHistogram
+
+# Block packing gives up on filling the last few bytes of a nearly full block
+# after this many consecutive transactions that don't fit (as Bitcoin Core does)
+MAX_PACKING_FAILURES = 1000
+BLOCK_FULL_MARGIN_BYTES = 4000
+# A child only pays for as many ancestors as fit in one package, like
+# Bitcoin Core's default ancestor limits; chains longer than this are mined
+# in several packages
+MAX_PACKAGE_COUNT = 25
+MAX_PACKAGE_BYTES = 101000
+
+@dataclass(eq=False, slots=True)
+class _Chunk:
+    """Consecutive chain transactions that are mined together"""
+    fee: float
+    size: int
+    transactions: List[Transaction]
+
+    def fee_rate(self):
+        return self.fee / self.size
+
+
+@dataclass(eq=False, slots=True)
+class _Chain:
+    """Pending transactions where each one spends the previous one.
+
+    The chain is split into chunks with decreasing fee rates, so the first
+    chunk is the prefix with the best ancestor fee rate: the package a miner
+    selecting by ancestor score takes first. A child paying a higher fee
+    rate than its parent merges into the parent's chunk (CPFP), up to the
+    package limits. Appending a transaction merges at most the chunks it
+    outbids, so chains stay cheap to extend however long they get.
+    """
+    chunks: Deque[_Chunk] = field(default_factory=deque)
+    version: int = 0
+    # In-pool transaction this chain spends from when that transaction
+    # already had a child; the chain can't be mined until it confirms
+    parent_id: Optional[int] = None
+    # Cumulative fee/size/count of the transactions that left the head
+    base_fee: float = 0.0
+    base_size: int = 0
+    base_count: int = 0
+
 
 @dataclass
 class Transaction_pool:
-    transactions: List[Transaction] = field(default_factory=list)
+    # transaction_id -> transaction, kept in arrival order
+    transactions: Dict[int, Transaction] = field(default_factory=dict)
+
+    # Limits (0 = unlimited). When the pool grows past max_count transactions
+    # or max_bytes bytes, the lowest-priority transactions are evicted.
+    # Transactions older than expiry seconds are dropped.
+    max_count: int = 0
+    max_bytes: int = 0
+    expiry: float = 0
+    # Called as on_drop(transaction, reason) for every evicted ("evicted")
+    # or expired ("expired") transaction
+    on_drop: Optional[Callable[[Transaction, str], None]] = None
+    # Called as on_add(transaction) for every transaction entering the pool
+    on_add: Optional[Callable[[Transaction], None]] = None
+    evicted_count: int = 0
+    expired_count: int = 0
+
+    # Pending bytes per fee-rate bucket, kept up to date on every add/remove
+    # so fee estimates never scan the pool. block_bytes is the block capacity
+    # estimates assume unless the caller passes one.
+    fee_histogram: FeeRateHistogram = field(default_factory=FeeRateHistogram, repr=False)
+    block_bytes: int = 1000000
+
+    # Every transaction belongs to a chain (independent ones to a chain of
+    # one). _links maps transaction_id -> [chain, cumulative fee, cumulative
+    # size, cumulative count, sequence], the cumulative values running from
+    # the start of the chain, so ancestor and descendant packages are
+    # differences against the chain's base and tail.
+    # Heap entries are never searched for: entries carry the chain version
+    # they were pushed for and stale ones are skipped when they reach the top.
+    #   _heap:          (-head chunk fee rate, timestamp, sequence, version, chain)
+    #   _eviction_heap: (tail chunk fee rate, -timestamp, -sequence, version, chain)
+    #   _expiry_heap:   (timestamp, sequence, transaction_id)
+    _heap: List[tuple] = field(default_factory=list, repr=False)
+    _eviction_heap: List[tuple] = field(default_factory=list, repr=False)
+    _expiry_heap: List[tuple] = field(default_factory=list, repr=False)
+    _links: Dict[int, list] = field(default_factory=dict, repr=False)
+    # transaction_id -> chains waiting for it to confirm
+    _dependents: Dict[int, List[_Chain]] = field(default_factory=dict, repr=False)
+    _chain_count: int = field(default=0, repr=False)
+    _sequence: itertools.count = field(default_factory=itertools.count, repr=False)
+    _total_fees: float = field(default=0.0, repr=False)
+    _total_bytes: int = field(default=0, repr=False)
 
 
     def add_transaction(self, transaction: Transaction):
-         if not any(tx.transaction_id == transaction.transaction_id for tx in self.transactions):
-            self.transactions.append(transaction)
-   
-
-    def get_transactions_by_priority(self, limit: int) -> List[Transaction]:
-        # Get transactions ordered by priority (fee per byte)
-        # Sort by priority (highest first) then by timestamp (oldest first)
-        sorted_transactions = sorted(
-            self.transactions, 
-            key=lambda tx: (-tx.priority, tx.timestamp)
-        )
-        
-        selected = sorted_transactions[:limit]
-        # Remove selected transactions from pool
-        self.transactions = [tx for tx in self.transactions if tx not in selected]
+        if transaction.transaction_id in self.transactions:
+            return
+        if self.expiry:
+            self.expire(transaction.timestamp)
+
+        parent_link = self._links.get(transaction.parent_id) if transaction.parent_id is not None else None
+        if parent_link is not None and self._is_tail(transaction.parent_id, parent_link[0]):
+            chain = parent_link[0]
+        else:
+            chain = _Chain()
+            self._chain_count += 1
+            if parent_link is not None:
+                chain.parent_id = transaction.parent_id
+                self._dependents.setdefault(transaction.parent_id, []).append(chain)
+
+        sequence = next(self._sequence)
+        fee = transaction.fee
+        size = transaction.size
+        chunk = _Chunk(fee, size, [transaction])
+        self.transactions[transaction.transaction_id] = transaction
+        self._total_fees += fee
+        self._total_bytes += size
+        if chain.chunks:
+            tail = self._links[chain.chunks[-1].transactions[-1].transaction_id]
+            self._links[transaction.transaction_id] = [chain, tail[1] + fee, tail[2] + size, tail[3] + 1, sequence]
+            self._append_chunk(chain, chunk)
+            self._touch(chain)
+        else:
+            # New chain of one: queue it directly at version 0
+            fee_rate = fee / size
+            self._links[transaction.transaction_id] = [chain, fee, size, 1, sequence]
+            chain.chunks.append(chunk)
+            self.fee_histogram.add(fee_rate, size)
+            if chain.parent_id is None:
+                heapq.heappush(self._heap, (-fee_rate, transaction.timestamp, sequence, 0, chain))
+            if self.max_count or self.max_bytes:
+                heapq.heappush(self._eviction_heap, (fee_rate, -transaction.timestamp, -sequence, 0, chain))
+        if self.expiry:
+            heapq.heappush(self._expiry_heap, (transaction.timestamp, sequence, transaction.transaction_id))
+        if self.on_add is not None:
+            self.on_add(transaction)
+        if self.max_count or self.max_bytes:
+            self._enforce_limits()
+
+
+    def get_transactions_by_priority(self, limit: int, max_bytes: int = 0) -> List[Transaction]:
+        # Get transactions by ancestor fee rate: repeatedly take the chunk
+        # (a transaction plus the unconfirmed ancestors it pays for) with the
+        # best fee per byte, oldest first on ties, up to limit transactions
+        # and max_bytes bytes (0 = no byte limit). Chunks that don't fit the
+        # remaining space are skipped, so smaller ones behind them can still
+        # fill the block. Parents always come before their children.
+        # Selected transactions are removed from the pool.
+        heap = self._heap
+        # When the block takes a large share of the pool, one sort (in C) is
+        # cheaper than a heap pop per chunk. The list is sorted in descending
+        # order so entries come off the end, and reversed afterwards, since an
+        # ascending list is a valid heap. Entries for chunks that become
+        # available while selecting go to a small side heap.
+        bulk = 4 * self._expected_selection(limit, max_bytes) >= len(heap)
+        fresh = []
+        if bulk:
+            heap.sort(reverse=True)
+
+        selected = []
+        skipped = []
+        remaining = max_bytes
+        failures = 0
+        while len(selected) < limit:
+            if not bulk:
+                if not heap:
+                    break
+                entry = heapq.heappop(heap)
+            elif fresh and (not heap or fresh[0] < heap[-1]):
+                entry = heapq.heappop(fresh)
+            elif heap:
+                entry = heap.pop()
+            else:
+                break
+            chain = entry[-1]
+            if entry[3] != chain.version or not chain.chunks or chain.parent_id is not None:
+                continue
+
+            chunk = chain.chunks[0]
+            if (len(chunk.transactions) > limit - len(selected) or
+                    (max_bytes and chunk.size > remaining)):
+                skipped.append(entry)
+                failures += 1
+                if failures > MAX_PACKING_FAILURES and (not max_bytes or remaining < BLOCK_FULL_MARGIN_BYTES):
+                    break
+                continue
+            remaining -= chunk.size
+            selected.extend(chunk.transactions)
+            self._confirm_head_chunk(chain, fresh if bulk else heap)
+
+        if bulk:
+            heap.reverse()
+            if fresh or skipped:
+                heap.extend(fresh)
+                heap.extend(skipped)
+                heapq.heapify(heap)
+        else:
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+        self._compact()
         return selected
 
 
-    def transactions_limit(self, limit):
-        return self.get_transactions_by_priority(limit)
-    
+    def transactions_limit(self, limit, max_bytes=0):
+        return self.get_transactions_by_priority(limit, max_bytes)
+
 
     def remove_confirmed_transaction(self, transaction_ids):
-        self.transactions = [transaction for transaction in self.transactions if transaction.transaction_id not in transaction_ids]
-    
+        # A confirmed transaction implies its in-pool ancestors confirmed too
+        for transaction_id in transaction_ids:
+            link = self._links.get(transaction_id)
+            if link is None:
+                continue
+            chain = link[0]
+            confirmed = self._remove_prefix(chain, link[3] - chain.base_count)
+            for transaction in confirmed:
+                self._unregister(transaction)
+            for transaction in confirmed:
+                self._release_dependents(transaction.transaction_id, self._heap)
+            self._settle(chain)
+        self._compact()
+
+
+    def expire(self, now):
+        """Drop transactions (and their descendants) waiting longer than expiry"""
+        cutoff = now - self.expiry
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            _, sequence, transaction_id = heapq.heappop(self._expiry_heap)
+            link = self._links.get(transaction_id)
+            if link is not None and link[4] == sequence:
+                chain = link[0]
+                self._drop_suffix(chain, self._chain_length(chain) - (link[3] - chain.base_count) + 1, "expired")
+
+
+    def get_ancestor_package(self, transaction_id) -> Tuple[int, int, float]:
+        """(count, size, fee) of a transaction and its in-pool chain ancestors"""
+        link = self._links[transaction_id]
+        chain = link[0]
+        return link[3] - chain.base_count, link[2] - chain.base_size, link[1] - chain.base_fee
+
+    def get_descendant_package(self, transaction_id) -> Tuple[int, int, float]:
+        """(count, size, fee) of a transaction and its in-pool chain descendants"""
+        link = self._links[transaction_id]
+        tail = self._tail_link(link[0])
+        transaction = self.transactions[transaction_id]
+        return (tail[3] - link[3] + 1,
+                tail[2] - link[2] + transaction.size,
+                tail[1] - link[1] + transaction.fee)
+
+    def get_ancestor_fee_rate(self, transaction_id):
+        _, size, fee = self.get_ancestor_package(transaction_id)
+        return fee / size
+
+
+    def estimate_fee(self, target_blocks=1, block_bytes=0):
+        """Fee rate (coins per byte) needed to confirm within target_blocks"""
+        return self.fee_histogram.estimate_fee_rate(target_blocks, block_bytes or self.block_bytes)
+
+    def get_fee_histogram(self):
+        return self.fee_histogram.snapshot()
+
 
     def get_pool_size(self):
         return len(self.transactions)
-        
+
+    def get_pool_bytes(self):
+        return self._total_bytes
+
     def get_total_fees(self):
-        return sum(tx.fee for tx in self.transactions)
\ No newline at end of file
+        return self._total_fees if self.transactions else 0.0
+
+
+    def _expected_selection(self, limit, max_bytes):
+        """Rough number of transactions a block of this size will take"""
+        if not max_bytes or not self._total_bytes:
+            return limit
+        return min(limit, max_bytes * len(self.transactions) // self._total_bytes)
+
+
+    def _enforce_limits(self):
+        """Evict lowest fee-rate chunks (descendants first) until the pool fits"""
+        while self._eviction_heap and (
+                (self.max_count and len(self.transactions) > self.max_count) or
+                (self.max_bytes and self._total_bytes > self.max_bytes)):
+            entry = heapq.heappop(self._eviction_heap)
+            chain = entry[-1]
+            if entry[3] == chain.version and chain.chunks:
+                self._drop_suffix(chain, len(chain.chunks[-1].transactions), "evicted")
+
+
+    def _append_chunk(self, chain, chunk):
+        """Append a chunk, merging it into the chunks before it that it outbids"""
+        chunks = chain.chunks
+        while (chunks and chunk.fee * chunks[-1].size > chunks[-1].fee * chunk.size and
+               len(chunks[-1].transactions) + len(chunk.transactions) <= MAX_PACKAGE_COUNT and
+               chunks[-1].size + chunk.size <= MAX_PACKAGE_BYTES):
+            previous = chunks.pop()
+            self._histogram_remove(previous)
+            previous.transactions.extend(chunk.transactions)
+            previous.fee += chunk.fee
+            previous.size += chunk.size
+            chunk = previous
+        chunks.append(chunk)
+        self.fee_histogram.add(chunk.fee_rate(), chunk.size, len(chunk.transactions))
+
+
+    def _rebuild_chunks(self, chain, transactions, later_chunks=()):
+        for transaction in transactions:
+            self._append_chunk(chain, _Chunk(transaction.fee, transaction.size, [transaction]))
+        for chunk in later_chunks:
+            self._append_chunk(chain, chunk)
+
+
+    def _confirm_head_chunk(self, chain, heap):
+        chunk = chain.chunks.popleft()
+        self._histogram_remove(chunk)
+        self._rebase(chain, chunk.transactions[-1])
+        for transaction in chunk.transactions:
+            self._unregister(transaction)
+        for transaction in chunk.transactions:
+            self._release_dependents(transaction.transaction_id, heap)
+        self._settle(chain, heap)
+
+
+    def _remove_prefix(self, chain, count):
+        """Take the first count transactions off a chain and re-chunk the rest"""
+        removed = []
+        chunks = chain.chunks
+        while count > 0 and chunks:
+            chunk = chunks.popleft()
+            self._histogram_remove(chunk)
+            if len(chunk.transactions) <= count:
+                removed.extend(chunk.transactions)
+                count -= len(chunk.transactions)
+                continue
+            removed.extend(chunk.transactions[:count])
+            later_chunks = list(chunks)
+            chunks.clear()
+            for later in later_chunks:
+                self._histogram_remove(later)
+            self._rebuild_chunks(chain, chunk.transactions[count:], later_chunks)
+            count = 0
+        if removed:
+            self._rebase(chain, removed[-1])
+        return removed
+
+
+    def _remove_suffix(self, chain, count):
+        """Take the last count transactions off a chain and re-chunk the rest"""
+        removed = deque()
+        chunks = chain.chunks
+        while count > 0 and chunks:
+            chunk = chunks.pop()
+            self._histogram_remove(chunk)
+            if len(chunk.transactions) <= count:
+                removed.extendleft(reversed(chunk.transactions))
+                count -= len(chunk.transactions)
+                continue
+            keep = len(chunk.transactions) - count
+            removed.extendleft(reversed(chunk.transactions[keep:]))
+            self._rebuild_chunks(chain, chunk.transactions[:keep])
+            count = 0
+        return list(removed)
+
+
+    def _drop_suffix(self, chain, count, reason):
+        """Drop the last count transactions of a chain and everything spending them"""
+        pending = [(chain, count)]
+        while pending:
+            chain, count = pending.pop()
+            dropped = self._remove_suffix(chain, count)
+            for transaction in dropped:
+                self._unregister(transaction)
+                if reason == "evicted":
+                    self.evicted_count += 1
+                else:
+                    self.expired_count += 1
+                if self.on_drop is not None:
+                    self.on_drop(transaction, reason)
+                for dependent in self._dependents.pop(transaction.transaction_id, ()):
+                    if dependent.chunks:
+                        pending.append((dependent, self._chain_length(dependent)))
+            self._settle(chain)
+
+
+    def _release_dependents(self, transaction_id, heap):
+        """Make chains waiting on a confirmed transaction selectable"""
+        for dependent in self._dependents.pop(transaction_id, ()):
+            if dependent.chunks and dependent.parent_id == transaction_id:
+                dependent.parent_id = None
+                self._push_selection(dependent, heap)
+
+
+    def _settle(self, chain, heap=None):
+        """Re-queue a chain after a change, or retire it once empty"""
+        if chain.chunks:
+            self._touch(chain, heap)
+        else:
+            chain.version += 1
+            self._chain_count -= 1
+
+
+    def _touch(self, chain, heap=None):
+        chain.version += 1
+        self._push_selection(chain, self._heap if heap is None else heap)
+        if self.max_count or self.max_bytes:
+            chunk = chain.chunks[-1]
+            tail = chunk.transactions[-1]
+            heapq.heappush(self._eviction_heap, (
+                chunk.fee_rate(), -tail.timestamp, -self._links[tail.transaction_id][4],
+                chain.version, chain))
+
+
+    def _push_selection(self, chain, heap):
+        if chain.parent_id is not None:
+            return
+        chunk = chain.chunks[0]
+        head = chunk.transactions[0]
+        heapq.heappush(heap, (
+            -chunk.fee_rate(), head.timestamp, self._links[head.transaction_id][4],
+            chain.version, chain))
+
+
+    def _rebase(self, chain, last_removed):
+        link = self._links[last_removed.transaction_id]
+        chain.base_fee, chain.base_size, chain.base_count = link[1], link[2], link[3]
+
+
+    def _unregister(self, transaction):
+        del self.transactions[transaction.transaction_id]
+        del self._links[transaction.transaction_id]
+        self._total_fees -= transaction.fee
+        self._total_bytes -= transaction.size
+
+
+    def _histogram_remove(self, chunk):
+        self.fee_histogram.remove(chunk.fee_rate(), chunk.size, len(chunk.transactions))
+
+
+    def _tail_link(self, chain):
+        if not chain.chunks:
+            return [chain, chain.base_fee, chain.base_size, chain.base_count, None]
+        return self._links[chain.chunks[-1].transactions[-1].transaction_id]
+
+
+    def _is_tail(self, transaction_id, chain):
+        return chain.chunks[-1].transactions[-1].transaction_id == transaction_id
+
+
+    def _chain_length(self, chain):
+        return self._tail_link(chain)[3] - chain.base_count
+
+
+    def _compact(self):
+        """Rebuild heaps once stale entries outnumber live ones"""
+        threshold = 2 * self._chain_count + 64
+        for name in ("_heap", "_eviction_heap"):
+            heap = getattr(self, name)
+            if len(heap) > threshold:
+                heap = [entry for entry in heap if entry[3] == entry[-1].version and entry[-1].chunks]
+                heapq.heapify(heap)
+                setattr(self, name, heap)
+        if len(self._expiry_heap) > 2 * len(self.transactions) + 64:
+            links = self._links
+            self._expiry_heap = [entry for entry in self._expiry_heap
+                                 if entry[2] in links and links[entry[2]][4] == entry[1]]
+            heapq.heapify(self._expiry_heap)
@@ -0,0 +1,306 @@
+import numpy as np
+from dataclasses import dataclass, field
+
+from simulator.blockchain.ids import GENESIS_ACCOUNT, anonymous_transaction_id, outpoint, transaction_id
+from simulator.blockchain.ledger import Ledger
+
+# Outpoints never reach these values: the top transaction ids belong to
+# miner index 2^30 - 1
+_EMPTY = np.uint64(0xFFFFFFFFFFFFFFFF)
+_DELETED = np.uint64(0xFFFFFFFFFFFFFFFE)
+# 2^64 / golden ratio, for Fibonacci hashing
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+MIN_INDEX_CAPACITY = 1 << 10
+MAX_INDEX_LOAD = 0.5
+MIN_ROW_CAPACITY = 1 << 10
+
+class OutpointIndex:
+    """Open-addressing hash map from outpoint to UTXO row in NumPy arrays.
+
+    Linear probing with tombstones. Every operation takes a batch of keys
+    and probes all of them in lockstep, so a block's spends or creations
+    cost a few vectorized passes instead of one dict operation each, at
+    12 bytes per slot.
+    """
+
+    def __init__(self, capacity=MIN_INDEX_CAPACITY):
+        self._allocate(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def _allocate(self, capacity):
+        self.capacity = capacity  # a power of two
+        self._mask = capacity - 1
+        self._shift = np.uint64(65 - capacity.bit_length())
+        self.keys = np.full(capacity, _EMPTY, dtype=np.uint64)
+        self.rows = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+        self.deleted = 0
+
+    def _home(self, keys):
+        return ((keys * _HASH_MULTIPLIER) >> self._shift).astype(np.int64)
+
+
+    def insert(self, keys, rows):
+        """Add new outpoints; keys must not be present yet"""
+        if self.count + self.deleted + len(keys) > self.capacity * MAX_INDEX_LOAD:
+            self._resize(self.count + len(keys))
+        pending = np.arange(len(keys))
+        slots = self._home(keys)
+        while len(pending):
+            at = slots[pending]
+            found = self.keys[at]
+            free = np.flatnonzero((found == _EMPTY) | (found == _DELETED))
+            if len(free):
+                # The first key probing a free slot takes it, the rest move on
+                claimed, first = np.unique(at[free], return_index=True)
+                winners = pending[free[first]]
+                self.deleted -= int(np.count_nonzero(self.keys[claimed] == _DELETED))
+                self.keys[claimed] = keys[winners]
+                self.rows[claimed] = rows[winners]
+                placed = np.zeros(len(pending), dtype=bool)
+                placed[free[first]] = True
+                pending = pending[~placed]
+            slots[pending] = (slots[pending] + 1) & self._mask
+        self.count += len(keys)
+
+    def lookup(self, keys):
+        """Rows of the given outpoints, -1 where absent"""
+        positions = self._find(keys)
+        rows = self.rows[positions].astype(np.int64)
+        rows[positions < 0] = -1
+        return rows
+
+    def remove(self, keys):
+        """Delete outpoints and return their rows; raises KeyError if one is absent"""
+        positions = self._find(keys)
+        if (positions < 0).any():
+            raise KeyError(f"Unknown outpoint {int(keys[np.argmax(positions < 0)])}")
+        self.keys[positions] = _DELETED
+        self.count -= len(keys)
+        self.deleted += len(keys)
+        return self.rows[positions]
+
+    def _find(self, keys):
+        positions = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        slots = self._home(keys)
+        while len(pending):
+            at = slots[pending]
+            found = self.keys[at]
+            hit = found == keys[pending]
+            positions[pending[hit]] = at[hit]
+            pending = pending[~(hit | (found == _EMPTY))]
+            slots[pending] = (slots[pending] + 1) & self._mask
+        return positions
+
+    def _resize(self, needed):
+        live = (self.keys != _EMPTY) & (self.keys != _DELETED)
+        keys, rows = self.keys[live], self.rows[live]
+        capacity = MIN_INDEX_CAPACITY
+        while needed > capacity * MAX_INDEX_LOAD:
+            capacity *= 2
+        self._allocate(capacity)
+        self.insert(keys, rows)
+
+
+    def nbytes(self):
+        return self.keys.nbytes + self.rows.nbytes
+
+
+@dataclass
+class UtxoLedger(Ledger):
+    """Ledger in the UTXO model.
+
+    Every unspent output is a row of NumPy columns (outpoint, owner slot,
+    value), found by outpoint through an OutpointIndex. The spendable
+    outputs of an account form a doubly linked list through the prev/next
+    columns, so coin selection only walks the sender's own coins, and
+    balances holds each account's spendable sum. Sending locks the selected
+    outputs by unlinking them; a block spends them and creates the payment,
+    change and coinbase outputs as one batch each. Change is spendable once
+    confirmed. Wallets start with outputs_per_wallet equal outputs.
+    """
+    outputs_per_wallet: int = 1
+
+    index: OutpointIndex = field(init=False, repr=False)
+    outpoints: np.ndarray = field(init=False, repr=False)
+    owners: np.ndarray = field(init=False, repr=False)
+    values: np.ndarray = field(init=False, repr=False)
+    prev_row: np.ndarray = field(init=False, repr=False)
+    next_row: np.ndarray = field(init=False, repr=False)
+    heads: np.ndarray = field(init=False, repr=False)  # newest spendable row per slot
+    _free: np.ndarray = field(init=False, repr=False)
+    _free_count: int = field(default=0, repr=False)
+    _rows_used: int = field(default=0, repr=False)
+
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.index = OutpointIndex()
+        self.outpoints = np.empty(MIN_ROW_CAPACITY, dtype=np.uint64)
+        self.owners = np.empty(MIN_ROW_CAPACITY, dtype=np.int32)
+        self.values = np.empty(MIN_ROW_CAPACITY)
+        self.prev_row = np.empty(MIN_ROW_CAPACITY, dtype=np.int32)
+        self.next_row = np.empty(MIN_ROW_CAPACITY, dtype=np.int32)
+        self.heads = np.full(len(self.balances), -1, dtype=np.int32)
+        self._free = np.empty(MIN_ROW_CAPACITY, dtype=np.int32)
+
+        # Fund the wallets through genesis outputs
+        self.balances[:] = 0
+        count = self.wallet_count * self.outputs_per_wallet
+        if count and self.starting_balance > 0:
+            genesis = np.uint64(transaction_id(GENESIS_ACCOUNT, 0))
+            keys = (genesis + np.arange(count, dtype=np.uint64)) << np.uint64(1)
+            owners = np.repeat(np.arange(self.wallet_count), self.outputs_per_wallet)
+            self._create(keys, owners, np.full(count, self.starting_balance / self.outputs_per_wallet))
+
+
+    def debit(self, slot, amount, fee):
+        """Select and lock the sender's newest outputs covering amount + fee"""
+        target = amount + fee
+        values = self.values
+        next_row = self.next_row
+        selected = []
+        total = 0.0
+        row = int(self.heads[slot])
+        while row >= 0 and total < target:
+            selected.append(row)
+            total += values.item(row)
+            row = next_row.item(row)
+        # The selection is a prefix of the list, cut off in O(1)
+        self.heads[slot] = row
+        if row >= 0:
+            self.prev_row[row] = -1
+        self.balances[slot] -= total
+        self.fees_paid[slot] += fee
+        self.nonces[slot] += 1
+        return tuple(self.outpoints[selected].tolist())
+
+    def refund(self, slot, transaction):
+        """Unlock a dropped transaction's inputs"""
+        if transaction.inputs:
+            rows = self.index.lookup(np.array(transaction.inputs, dtype=np.uint64))
+            self._link(rows, np.full(len(rows), slot))
+            self.balances[slot] += self.values[rows].sum()
+        self.fees_paid[slot] -= transaction.fee
+        if self.parked[slot]:
+            self._wake(slot)
+
+    def credit(self, slot, amount):
+        key = np.array([outpoint(anonymous_transaction_id(), 0)], dtype=np.uint64)
+        self._create(key, np.array([slot]), np.array([float(amount)]))
+        if self.parked[slot]:
+            self._wake(slot)
+
+
+    def apply_block(self, transactions, miner_account, reward):
+        """Spend a block's inputs and create its outputs in batches.
+
+        Each transaction pays amount to the receiver (vout 0) and returns
+        its inputs minus amount and fee to the sender (vout 1). The
+        coinbase pays the miner reward plus fees. Returns the block's fees.
+        """
+        count = len(transactions)
+        miner_slot = self.slot(miner_account)
+        coinbase = (transaction_id(miner_account, int(self.nonces[miner_slot])) << 1)
+        self.nonces[miner_slot] += 1
+        if not count:
+            self._create(np.array([coinbase], dtype=np.uint64), np.array([miner_slot]), np.array([float(reward)]))
+            if self.parked[miner_slot]:
+                self._wake(miner_slot)
+            return 0.0
+
+        input_counts = np.fromiter((len(tx.inputs or ()) for tx in transactions), np.int64, count)
+        spent = np.fromiter((key for tx in transactions for key in tx.inputs or ()), np.uint64, int(input_counts.sum()))
+        rows = self.index.remove(spent)
+        input_values = np.bincount(np.repeat(np.arange(count), input_counts), weights=self.values[rows], minlength=count)
+        self._release(rows)
+
+        tx_ids = np.fromiter((tx.transaction_id for tx in transactions), np.uint64, count)
+        senders = self.slots(np.fromiter((tx.sender for tx in transactions), np.int64, count))
+        receivers = self.slots(np.fromiter((tx.receiver for tx in transactions), np.int64, count))
+        amounts = np.fromiter((tx.amount for tx in transactions), float, count)
+        fees = np.fromiter((tx.fee for tx in transactions), float, count)
+        total_fees = float(fees.sum())
+        change = input_values - amounts - fees
+        has_change = change > 1e-12
+
+        one = np.uint64(1)
+        keys = np.concatenate((tx_ids << one, (tx_ids[has_change] << one) | one, np.array([coinbase], dtype=np.uint64)))
+        owners = np.concatenate((receivers, senders[has_change], [miner_slot]))
+        values = np.concatenate((amounts, change[has_change], [reward + total_fees]))
+        self._create(keys, owners, values)
+        if self._wake_events:
+            for slot in np.unique(owners[self.parked[owners]]).tolist():
+                self._wake(slot)
+        return total_fees
+
+
+    def _create(self, keys, owners, values):
+        rows = self._allocate_rows(len(keys))
+        self.outpoints[rows] = keys
+        self.owners[rows] = owners
+        self.values[rows] = values
+        self.index.insert(keys, rows)
+        self._link(rows, owners)
+        np.add.at(self.balances, owners, values)
+
+    def _link(self, rows, owners):
+        """Push rows in front of their owners' spendable lists"""
+        order = np.argsort(owners, kind="stable")
+        rows, owners = rows[order], owners[order]
+        same = owners[1:] == owners[:-1]
+        self.next_row[rows[:-1][same]] = rows[1:][same]
+        self.prev_row[rows[1:][same]] = rows[:-1][same]
+        starts = np.flatnonzero(np.concatenate(([True], ~same)))
+        ends = np.append(starts[1:] - 1, len(rows) - 1)
+        first, last, group_owners = rows[starts], rows[ends], owners[starts]
+        old_heads = self.heads[group_owners]
+        self.prev_row[first] = -1
+        self.next_row[last] = old_heads
+        has_head = old_heads >= 0
+        self.prev_row[old_heads[has_head]] = last[has_head]
+        self.heads[group_owners] = first
+
+    def _allocate_rows(self, count):
+        reused = min(count, self._free_count)
+        self._free_count -= reused
+        fresh = count - reused
+        if self._rows_used + fresh > len(self.values):
+            self._grow_rows(self._rows_used + fresh)
+        rows = np.concatenate((self._free[self._free_count:self._free_count + reused],
+                               np.arange(self._rows_used, self._rows_used + fresh, dtype=np.int32)))
+        self._rows_used += fresh
+        return rows
+
+    def _release(self, rows):
+        if self._free_count + len(rows) > len(self._free):
+            self._free = _grown(self._free, self._free_count + len(rows))
+        self._free[self._free_count:self._free_count + len(rows)] = rows
+        self._free_count += len(rows)
+
+    def _grow_rows(self, needed):
+        self.outpoints = _grown(self.outpoints, needed)
+        self.owners = _grown(self.owners, needed)
+        self.values = _grown(self.values, needed)
+        self.prev_row = _grown(self.prev_row, needed)
+        self.next_row = _grown(self.next_row, needed)
+
+
+    def utxo_count(self):
+        return len(self.index)
+
+    def utxo_bytes(self):
+        """Memory of the UTXO set: row columns, free list and index"""
+        return (self.outpoints.nbytes + self.owners.nbytes + self.values.nbytes +
+                self.prev_row.nbytes + self.next_row.nbytes + self.heads.nbytes +
+                self._free.nbytes + self.index.nbytes())
+
+
+def _grown(array, needed):
+    """Copy of array with room for at least needed entries, doubling"""
+    grown = np.empty(max(needed, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
@@ -1,15 +1,15 @@
 from dataclasses import dataclass
 from typing import Optional, List
+from simulator.blockchain.ledger import Ledger
+from simulator.blockchain.transaction import Transaction
 
 @dataclass
 class Wallet:
     wallet_id: int
-    balance: float
-    transactions_sent: int = 0
-    total_fees_paid: float = 0
+    ledger: Ledger  # balance, sent count and fees live in the ledger arrays
 
     region: str = ""
-    transaction_history: List[str] = None
+    transaction_history: List[int] = None
 
 
     def __post_init__(self):
@@ -17,35 +17,64 @@ class Wallet:
             self.transaction_history = []
 
 
-    def send_transaction(self, receiver, amount, fee, pool, timestamp, transaction_id):
+    @property
+    def balance(self):
+        return float(self.ledger.balances[self.wallet_id])
+
+    @property
+    def transactions_sent(self):
+        return int(self.ledger.nonces[self.wallet_id])
+
+    @property
+    def total_fees_paid(self):
+        return float(self.ledger.fees_paid[self.wallet_id])
+
+
+    def can_afford(self, amount, fee):
+        return self.ledger.balances[self.wallet_id] >= amount + fee
+
+    def park(self, event):
+        """Wait on event until the next payment or refund arrives"""
+        return self.ledger.park(self.wallet_id, event)
+
+    def is_parked(self):
+        return bool(self.ledger.parked[self.wallet_id])
+
+
+    def send_transaction(self, receiver, amount, fee, pool, timestamp, transaction_id, size=256, parent_id=None):
         # Validate balance
         # if self.balance < (amount + fee):
         #     raise ValueError(f"Insufficient balance: {self.balance} < {amount + fee}")
-        
-        if self.balance < (amount + fee):
+
+        if not self.can_afford(amount, fee):
             raise ValueError(f"Insufficient balance: {self.balance} < {amount + fee}")
 
-        from simulator.blockchain.transaction import Transaction
+        inputs = self.ledger.debit(self.wallet_id, amount, fee)
         transaction = Transaction(
             transaction_id=transaction_id,
             sender=self.wallet_id,
             receiver=receiver,
             amount=amount,
             timestamp=timestamp,
-            fee=fee
+            fee=fee,
+            size=size,
+            parent_id=parent_id,
+            inputs=inputs
         )
-        
-        self.balance -= (amount + fee)
-        self.transactions_sent += 1
-        self.total_fees_paid += fee
+
         self.transaction_history.append(transaction_id)
         pool.add_transaction(transaction)
-        
+
+
+    def refund_transaction(self, transaction):
+        """Called when a pending transaction is dropped from the pool"""
+        self.ledger.refund(self.wallet_id, transaction)
+
 
     def receive_payment(self, amount):
-        """Called when transaction is confirmed in block"""
-        self.balance += amount
+        """Called for payments outside a block; blocks go through Ledger.apply_block"""
+        self.ledger.credit(self.wallet_id, amount)
+
 
-    
     def get_effective_balance(self):
-        return max(0, self.balance)
\ No newline at end of file
+        return max(0, self.balance)
@@ -195,6 +195,8 @@ class JSONBasedCLI:
                 config_kwargs['reward'] = chain_config.initial_reward
                 config_kwargs['blocktime'] = chain_config.target_block_time
                 config_kwargs['blocksize'] = chain_config.max_transactions
+                config_kwargs['blockbytes'] = chain_config.max_size_bytes
+                config_kwargs['txsize'] = chain_config.transaction_size_bytes
                 config_kwargs['halving'] = chain_config.halving_interval or 0
                 
                 # Set mining defaults if not specified
@@ -210,9 +212,15 @@ class JSONBasedCLI:
         if 'workload' in args:
             try:
                 workload_config = self.config_loader.load_workload_config(args['workload'])
-                config_kwargs['wallets'] = workload_config.wallets
-                config_kwargs['transactions'] = workload_config.transactions_per_wallet
-                config_kwargs['interval'] = workload_config.transaction_interval
+                self._apply_workload(config_kwargs, workload_config)
+            except FileNotFoundError as e:
+                print(f"Warning: {e}")
+        
+        # Handle scenario workloads from config/network (e.g. stress_test)
+        if 'scenario' in args:
+            try:
+                scenario_config = self.config_loader.load_scenario_config(args['scenario'])
+                self._apply_workload(config_kwargs, scenario_config.workload)
             except FileNotFoundError as e:
                 print(f"Warning: {e}")
         
@@ -233,6 +241,13 @@ class JSONBasedCLI:
         
         return config.Config(**config_kwargs)
 
+    def _apply_workload(self, config_kwargs, workload_config):
+        config_kwargs['wallets'] = workload_config.wallets
+        config_kwargs['transactions'] = workload_config.transactions_per_wallet
+        config_kwargs['interval'] = workload_config.transaction_interval
+        if workload_config.transaction_size_distribution:
+            config_kwargs['txsizes'] = workload_config.transaction_size_distribution
+
     def convert_value(self, key, value):
         try:
             if key in self.cli_mapping["data_types"]:
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 
+from simulator.blockchain.block import HEADER_SIZE_BYTES
+
 @dataclass
 class Config:
     nodes: int = 7
@@ -13,10 +15,38 @@ class Config:
     transactions: int = 100
     interval: int = 1
     blocksize: int = 1000
+    blockbytes: int = 0  # Max block size in bytes (0 = limited by blocksize only)
+    txsize: int = 256  # Transaction size in bytes when no distribution is given
+    txsizes: dict = None  # {"class": {"probability": p, "size_bytes": n}, ...}
     blocks: int = 10
     print: int = 144  # Changed from bool to int with default 144
     debug: bool = False
     halving: int = 210000  # Default Bitcoin halving schedule
+    poolsize: int = 0  # Max transactions in the pool (0 = unlimited)
+    poolbytes: int = 0  # Max pool size in bytes (0 = unlimited)
+    expiry: float = 0  # Seconds before a pending transaction expires (0 = never)
+    feetarget: int = 0  # Wallets bid the estimated fee for this many blocks (0 = fixed fee)
+    chaining: float = 0  # Probability a transaction depends on the sender's previous one (account model)
+    aggregate: int = 100  # Wallet count from which one process sends for all wallets (0 = never)
+    arrivals: str = "fixed"  # Transaction interarrival times: fixed or poisson
+    receivers: str = "next"  # Receiver choice: next, uniform or zipf
+    zipf: float = 1.2  # Zipf exponent of receiver popularity
+    amount: float = 1.0  # Mean transaction amount
+    fee: float = 0.01  # Mean transaction fee
+    dispersion: float = 0  # Lognormal sigma of amounts and fees (0 = constant)
+    chunk: int = 65536  # Transactions drawn per workload chunk
+    utxos: int = 0  # Starting outputs per wallet; > 0 switches to the UTXO model
+    blockfile: str = ""  # Append finished blocks to this binary file ("" = keep all in memory)
+    window: int = 100  # Recent blocks kept in memory when writing a block file or headers only
+    blockmode: str = "full"  # full, or headers: blocks keep only counts, fees and size
+    timeseries: str = ""  # Record metrics to PATH.csv and PATH.npz ("" = off)
+    tsevery: int = 1  # Blocks between time-series samples
+    topology: str = "global_distributed"  # Scenario of config/network/topology.json
+    seed: int = 0  # Seed of all random streams (0 = unseeded)
+    strategy: str = "stub"  # Topology generator, or scenario for the topology's connection_strategy
+    trickle: float = 0  # Seconds between transaction relay rounds (0 = no transaction relay)
+    bandwidth: str = "mixed"  # Uplink profile of config/network.json for every node, or mixed
+    loss: str = "mixed"  # Packet loss profile of config/network.json for every node, or mixed
 
     def __post_init__(self):
         if self.nodes < self.miners:
@@ -41,12 +71,56 @@ class Config:
             raise ValueError("Interval must be a positive integer.")
         if self.blocksize <= 0:
             raise ValueError("Block size must be a positive integer.")
+        if self.blockbytes < 0:
+            raise ValueError("Block bytes cannot be negative.")
+        if 0 < self.blockbytes <= HEADER_SIZE_BYTES:
+            raise ValueError(f"Block bytes must exceed the {HEADER_SIZE_BYTES}-byte block header.")
+        if self.txsize <= 0:
+            raise ValueError("Transaction size must be a positive integer.")
         if self.blocks <= 0:
             raise ValueError("Number of blocks must be a positive integer.")
         if not isinstance(self.print, int) or self.print <= 0:
             raise ValueError("Print interval must be a positive integer")
         if self.debug not in [True, False]:
             raise ValueError("Debug mode must be a boolean value.")
+        if self.poolsize < 0 or self.poolbytes < 0:
+            raise ValueError("Pool limits cannot be negative.")
+        if self.expiry < 0:
+            raise ValueError("Expiry cannot be negative.")
+        if self.feetarget < 0:
+            raise ValueError("Fee target cannot be negative.")
+        if not 0 <= self.chaining <= 1:
+            raise ValueError("Chaining must be a probability between 0 and 1.")
+        if self.aggregate < 0:
+            raise ValueError("Aggregate threshold cannot be negative.")
+        if self.arrivals not in ["fixed", "poisson"]:
+            raise ValueError("Arrivals must be fixed or poisson.")
+        if self.receivers not in ["next", "uniform", "zipf"]:
+            raise ValueError("Receivers must be next, uniform or zipf.")
+        if self.zipf <= 0:
+            raise ValueError("Zipf exponent must be positive.")
+        if self.amount <= 0 or self.fee < 0:
+            raise ValueError("Amount must be positive and fee cannot be negative.")
+        if self.dispersion < 0:
+            raise ValueError("Dispersion cannot be negative.")
+        if self.chunk <= 0:
+            raise ValueError("Chunk must be a positive integer.")
+        if self.utxos < 0:
+            raise ValueError("UTXO count cannot be negative.")
+        if self.window <= 0:
+            raise ValueError("Window must be a positive integer.")
+        if self.blockmode not in ["full", "headers"]:
+            raise ValueError("Block mode must be full or headers.")
+        if self.strategy not in ["stub", "preferential_attachment", "mesh", "watts_strogatz", "scenario"]:
+            raise ValueError("Strategy must be stub, preferential_attachment, mesh, watts_strogatz or scenario.")
+        if self.seed < 0:
+            raise ValueError("Seed cannot be negative.")
+        if self.tsevery <= 0:
+            raise ValueError("Time-series interval must be a positive integer.")
+        if self.trickle < 0:
+            raise ValueError("Trickle interval cannot be negative.")
+        if not self.bandwidth or not self.loss:
+            raise ValueError("Bandwidth and loss profiles cannot be empty.")
         
     # def __str__(self):
     #     return (f"Config (nodes={self.nodes}, neighbors={self.neighbors}, miners={self.miners}, hashrate={self.hashrate}, "
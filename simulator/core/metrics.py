@@ -1,6 +1,41 @@
+import numpy as np
 from dataclasses import dataclass, field
 from typing import List
 
+from simulator.core.sketch import QuantileSketch
+
+RETARGET_WINDOW = 2016  # blocks between difficulty adjustments
+SECONDS_PER_YEAR = 365.25 * 24 * 60 * 60
+
+@dataclass
+class RollingWindow:
+    """Ring buffer of the last size values with a running sum"""
+    size: int
+    total: float = 0.0
+    count: int = 0
+    _values: List[float] = field(default=None, repr=False)
+    _next: int = 0
+
+    def __post_init__(self):
+        self._values = [0.0] * self.size
+
+    def push(self, value):
+        old = self._values[self._next]
+        self._values[self._next] = value
+        self._next += 1
+        if self._next == self.size:
+            # Re-sum once per wrap so float drift cannot build up
+            self._next = 0
+            self.total = sum(self._values)
+        else:
+            self.total += value - old
+        if self.count < self.size:
+            self.count += 1
+
+    def is_full(self):
+        return self.count == self.size
+
+
 @dataclass
 class SimulationMetrics:
     """Enhanced metrics tracking for assignment compliance"""
@@ -9,22 +44,76 @@ class SimulationMetrics:
     coin_supply: float = 0.0
     network_data: float = 0.0  # in MB
     io_requests: int = 0
-    block_times: List[float] = field(default_factory=list)
+    block_count: int = 0
+    total_block_time: float = 0.0
+    # Intervals and issuance of the last RETARGET_WINDOW blocks
+    block_window: RollingWindow = field(default_factory=lambda: RollingWindow(RETARGET_WINDOW))
+    issuance_window: RollingWindow = field(default_factory=lambda: RollingWindow(RETARGET_WINDOW))
     difficulty_adjustments: int = 0
     halving_count: int = 0
     pending_transactions: int = 0
+    evicted_transactions: int = 0  # dropped from a full pool
+    expired_transactions: int = 0  # dropped after waiting too long
+    skipped_transactions: int = 0  # sends a broke wallet could not afford
+    utxo_count: int = 0  # unspent outputs in the UTXO model
+    utxo_bytes: int = 0  # memory of the UTXO set
+    relay_messages: int = 0  # INV, GETDATA and TX messages of the transaction relay
+    relay_bytes: int = 0
+    retransmitted_packets: int = 0  # packets lost on links and sent again
+    # Distributions in fixed memory: submission to inclusion delay, block
+    # interval and propagation time in seconds, pool size per block
+    confirmation_latency: QuantileSketch = field(default_factory=QuantileSketch)
+    block_intervals: QuantileSketch = field(default_factory=QuantileSketch)
+    propagation_times: QuantileSketch = field(default_factory=QuantileSketch)
+    pool_sizes: QuantileSketch = field(default_factory=QuantileSketch)
+    
+    def record_block(self, interval, issuance):
+        """Account a mined block: its interval and the coins it created"""
+        self.block_count += 1
+        self.total_block_time += interval
+        self.coin_supply += issuance
+        self.block_window.push(interval)
+        self.issuance_window.push(issuance)
+        self.block_intervals.add(interval)
+    
+    def record_confirmations(self, now, transactions):
+        self.confirmation_latency.add_many(
+            now - np.fromiter((tx.timestamp for tx in transactions), dtype=np.float64, count=len(transactions)))
+    
+    def sketches(self):
+        return {"confirmation_latency": self.confirmation_latency, "block_intervals": self.block_intervals,
+                "propagation_times": self.propagation_times, "pool_sizes": self.pool_sizes}
+    
+    def merge_sketches(self, other: "SimulationMetrics"):
+        """Fold the distributions of another run, e.g. a parallel one, into these"""
+        for name, sketch in self.sketches().items():
+            sketch.merge(getattr(other, name))
     
     def get_average_block_time(self) -> float:
-        return sum(self.block_times) / len(self.block_times) if self.block_times else 0
+        return self.total_block_time / self.block_count if self.block_count else 0
     
     def get_tps(self, current_time: float) -> float:
         return self.confirmed_transactions / current_time if current_time > 0 else 0
     
     def get_inflation_rate(self) -> float:
-        if len(self.block_times) <= 1:
-            return 0.0
-        # Calculate inflation based on recent coin issuance
-        if len(self.block_times) >= 2016:
-            recent_supply_change = self.coin_supply - (self.coin_supply * 0.95)
-            return (recent_supply_change / self.coin_supply) * 100 if self.coin_supply > 0 else 0.0
-        return 0.0
\ No newline at end of file
+        """Annualized supply growth over the last RETARGET_WINDOW blocks, in percent.
+
+        NaN while there is no supply before the window to grow from, i.e.
+        during the first RETARGET_WINDOW blocks of a chain starting at zero.
+        """
+        issued = self.issuance_window.total
+        elapsed = self.block_window.total
+        base_supply = self.coin_supply - issued
+        if elapsed <= 0 or base_supply <= 0:
+            return float("nan")
+        return issued / base_supply * (SECONDS_PER_YEAR / elapsed) * 100
+
+def format_inflation(rate) -> str:
+    """Inflation rate as "x.xx%", "-" when it is unavailable"""
+    return "-" if np.isnan(rate) else f"{rate:.2f}%"
+
+def format_quantiles(sketch: QuantileSketch, precision=2) -> str:
+    """p50/p95/p99 of a sketch as "a/b/c", "-" when it has no samples"""
+    if not sketch.count:
+        return "-"
+    return "/".join(f"{value:.{precision}f}" for value in sketch.quantiles((0.5, 0.95, 0.99)))
@@ -0,0 +1,63 @@
+import zlib
+import numpy as np
+from typing import Dict, Optional
+
+# Scalar draws are served from buffers of this many pre-drawn variates
+RNG_BUFFER = 4096
+
+class RandomStream:
+    """One named, independently seeded source of random variates.
+
+    Scalar draws come from NumPy buffers of standard variates refilled
+    RNG_BUFFER at a time, which is much cheaper than one call into NumPy
+    or random per value. Vectorized code draws arrays from generator.
+    """
+
+    def __init__(self, generator: np.random.Generator, buffer=RNG_BUFFER):
+        self.generator = generator
+        self.buffer = buffer
+        # Iterators over the current buffer of each standard distribution
+        self._uniform = iter(())
+        self._exponential = iter(())
+
+
+    def random(self) -> float:
+        """Uniform on [0, 1)"""
+        try:
+            return next(self._uniform)
+        except StopIteration:
+            self._uniform = iter(self.generator.random(self.buffer).tolist())
+            return next(self._uniform)
+
+    def exponential(self, rate) -> float:
+        """Exponential with the given rate (mean 1 / rate), like random.expovariate"""
+        try:
+            return next(self._exponential) / rate
+        except StopIteration:
+            self._exponential = iter(self.generator.standard_exponential(self.buffer).tolist())
+            return next(self._exponential) / rate
+
+
+class RandomService:
+    """Named random streams of one run.
+
+    Every stream is seeded from the run seed and a stable hash of its name,
+    so streams are independent of each other and of the order they are
+    created in: the same seed reproduces a run exactly, and drawing more
+    from one subsystem does not shift another. Without a seed the run
+    entropy is drawn from the OS.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self._streams: Dict[str, RandomStream] = {}
+
+    def stream(self, name) -> RandomStream:
+        stream = self._streams.get(name)
+        if stream is None:
+            seed = np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=(zlib.crc32(name.encode()),))
+            stream = self._streams[name] = RandomStream(np.random.default_rng(seed))
+        return stream
+
+    def generator(self, name) -> np.random.Generator:
+        return self.stream(name).generator
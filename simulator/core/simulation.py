@@ -1,28 +1,74 @@
 import simpy
 import time
-import random
 from typing import List
 
-from simulator.core.metrics import SimulationMetrics  # Keep this import
+from simulator.core.metrics import RETARGET_WINDOW, SimulationMetrics, format_inflation, format_quantiles  # Keep this import
+from simulator.core.workload import WorkloadGenerator
+from simulator.core.timeseries import TimeSeriesWriter
+from simulator.core.rng import RandomService
 from simulator.blockchain.nodes import Node
 from simulator.blockchain.miner import Miner
 from simulator.blockchain.wallet import Wallet
-from simulator.blockchain.block import Block
+from simulator.blockchain.ledger import Ledger
+from simulator.blockchain.utxo import UtxoLedger
+from simulator.blockchain.block_sink import BlockSink, FileBlockSink, HeaderBlockSink, MemoryBlockSink
 from simulator.blockchain.transaction_pool import Transaction_pool
 from simulator.network.topology import Network_topology
 from simulator.network.network_simulator import NetworkSimulator
+from simulator.network.links import LinkQueues
+from simulator.network.propagation import GossipEngine
+from simulator.network.relay import TransactionRelay
+from simulator.processes.wallet_process import WalletProcessManager
+
+# Time-series columns; gauges are averaged when downsampled, the others
+# are times and running totals
+TIMESERIES_COLUMNS = (
+    "time", "blocks", "transactions", "confirmed", "pending", "coin_supply",
+    "avg_block_time", "tps", "inflation", "difficulty", "network_mb", "io_requests",
+    "evicted", "expired", "skipped", "utxo_count", "utxo_bytes",
+    "latency_p50", "latency_p95", "latency_p99", "interval_p50", "interval_p95", "interval_p99",
+    "propagation_p50", "propagation_p95", "propagation_p99", "pool_p50", "pool_p95", "pool_p99",
+    "relay_messages", "relay_mb", "retransmitted_packets",
+)
+TIMESERIES_GAUGES = ("pending", "inflation", "utxo_count", "utxo_bytes")
 
 class BlockchainSimulation:
     def __init__(self, config):
         self.config = config
         self.env = simpy.Environment()
+        # Named random streams, reproducible from --seed
+        self.rng = RandomService(config.seed or None)
         
         # Core components
         self.nodes: List[Node] = []
         self.miners: List[Miner] = []
         self.wallets: List[Wallet] = []
-        self.transaction_pool = Transaction_pool()
-        self.blocks: List[Block] = []
+        # Balances of all wallets and miners, kept for the whole run
+        if config.utxos:
+            self.ledger = UtxoLedger(config.wallets, config.miners, starting_balance=1000.0,
+                                     outputs_per_wallet=config.utxos)
+        else:
+            self.ledger = Ledger(config.wallets, config.miners, starting_balance=1000.0)
+        self.transaction_pool = Transaction_pool(
+            max_count=config.poolsize,
+            max_bytes=config.poolbytes,
+            expiry=config.expiry,
+            on_drop=self._on_transaction_dropped,
+            block_bytes=config.blockbytes or config.blocksize * config.txsize
+        )
+        # Finished blocks; with a block file or headers-only blocks only a
+        # recent window of Block objects stays in memory
+        headers_only = config.blockmode == "headers"
+        if config.blockfile:
+            self.blocks: BlockSink = FileBlockSink(config.blockfile, window=config.window,
+                                                   headers_only=headers_only)
+        elif headers_only:
+            self.blocks = HeaderBlockSink(window=config.window)
+        else:
+            self.blocks = MemoryBlockSink()
+        self.timeseries = None
+        if config.timeseries:
+            self.timeseries = TimeSeriesWriter(config.timeseries, TIMESERIES_COLUMNS, TIMESERIES_GAUGES)
         
         # Simulation state
         self.metrics = SimulationMetrics()
@@ -31,8 +77,13 @@ class BlockchainSimulation:
         self.last_block_time = 0
         
         # Network components
-        self.topology = Network_topology()
-        self.network_simulator = NetworkSimulator(config)  # Added this
+        self.topology = Network_topology(rng=self.rng.generator("topology"))
+        self.network_simulator = NetworkSimulator(config, rng=self.rng.generator("network"))  # Added this
+        self.gossip = None  # built once the topology exists
+        self.relay = None  # transaction relay, with --trickle
+        
+        # Transaction generation
+        self.wallet_processes = WalletProcessManager(self.env, config, rng=self.rng)
         
     def run(self):
         start_time = time.time()
@@ -42,6 +93,7 @@ class BlockchainSimulation:
         print(f"Wallets: {self.config.wallets}, Transactions: {self.config.transactions}")
         print(f"Difficulty: {self.current_difficulty}")
         
+        failed = False
         try:
             # Initialize components
             self._setup_network()
@@ -60,16 +112,38 @@ class BlockchainSimulation:
             self.env.run()
             
         except Exception as e:
+            failed = True
             print(f"Simulation failed: {e}")
             import traceback
             traceback.print_exc()
             raise
         finally:
-            # Print final results
-            self._print_final_summary(start_time)
+            try:
+                self.blocks.close()
+            except Exception as e:
+                # Keep the error that stopped the run rather than the one it left behind
+                if not failed:
+                    raise
+                print(f"Closing the block sink failed as well: {e}")
+            finally:
+                if self.timeseries:
+                    self.timeseries.close()
+                # Print final results
+                self._print_final_summary(start_time)
     
     def _setup_network(self):
-        self.topology.create_network(self.nodes, self.config.nodes, self.config.neighbors)
+        scenario = self.network_simulator.topology_config.get(self.config.topology, {})
+        graph = self.topology.create_network(self.nodes, self.config.nodes, self.config.neighbors,
+                                             strategy=self.config.strategy, scenario=scenario)
+        self.network_simulator.assign_regions(self.nodes)
+        self.network_simulator.assign_bandwidth(len(self.nodes))
+        links = LinkQueues(graph, self.network_simulator.node_uplinks, self.network_simulator.node_loss,
+                           self.rng.generator("links"))
+        self.gossip = GossipEngine(self.env, self.nodes, graph, self.topology.inventory, self.network_simulator,
+                                   links)
+        if self.config.trickle:
+            self.relay = TransactionRelay(self.env, graph, self.metrics, self.config.trickle, links)
+            self.transaction_pool.on_add = self._on_transaction_added
         
     def _setup_miners(self):
         for i in range(self.config.miners):
@@ -84,7 +158,7 @@ class BlockchainSimulation:
             
     def _setup_wallets(self):
         for i in range(self.config.wallets):
-            wallet = Wallet(wallet_id=i, balance=1000.0)  # Increased starting balance
+            wallet = Wallet(wallet_id=i, ledger=self.ledger)
             self.wallets.append(wallet)
     
     def _start_mining_processes(self):
@@ -92,13 +166,23 @@ class BlockchainSimulation:
             self.env.process(self._mining_process(miner))
     
     def _start_wallet_processes(self):
+        if ((self.config.aggregate and len(self.wallets) >= self.config.aggregate) or
+                not WorkloadGenerator.is_default(self.config)):
+            # One process sends the vectorized workload for every wallet
+            self.env.process(self.wallet_processes.aggregated_wallet_process(
+                self.wallets, self.transaction_pool, self.metrics
+            ))
+            return
         for wallet in self.wallets:
-            self.env.process(self._wallet_process(wallet))
+            self.env.process(self.wallet_processes.wallet_process(
+                wallet, self.transaction_pool, self.metrics
+            ))
     
     def _mining_process(self, miner):
         block_id = len(self.blocks) + 1
         blocks_since_retarget = 0
         
+        stream = self.rng.stream(f"miner{miner.miner_id}")
         print(f"Miner {miner.miner_id} starting mining process")
         
         while len(self.blocks) < self.config.blocks:
@@ -106,7 +190,7 @@ class BlockchainSimulation:
             # Expected time per block ∼ Exp(total_hashrate / difficulty)
             total_hashrate = self.config.miners * self.config.hashrate
             rate = total_hashrate / self.current_difficulty
-            mining_time = random.expovariate(rate)
+            mining_time = stream.exponential(rate)
             
             print(f"Miner {miner.miner_id} waiting {mining_time:.2f}s to mine block {block_id}")
             
@@ -121,42 +205,46 @@ class BlockchainSimulation:
             current_time = self.env.now
             time_since_last = current_time - self.last_block_time
             
-            # Create wallets dictionary for miner
-            wallets_dict = {wallet.wallet_id: wallet for wallet in self.wallets}
-            wallets_dict[f"miner_{miner.miner_id}"] = Wallet(
-                wallet_id=f"miner_{miner.miner_id}",
-                balance=0.0
-            )
-            
             # Mine block
-            block, included_tx_ids = miner.mine_block(
+            block, included = miner.mine_block(
                 parent_block_id=block_id - 1,
                 pool=self.transaction_pool,
                 block_id=block_id,
                 timestamp=int(current_time),
                 blocksize=self.config.blocksize,
-                wallets_dict=wallets_dict
+                ledger=self.ledger,
+                max_bytes=self.config.blockbytes,
+                headers_only=self.config.blockmode == "headers"
             )
             
             # Update block timing
             block.header.time_since_last_block = time_since_last
             self.blocks.append(block)
-            self.metrics.block_times.append(time_since_last)
-            self.metrics.coin_supply += self.current_reward
-            self.metrics.confirmed_transactions += len(included_tx_ids)
-            self.metrics.pending_transactions -= len(included_tx_ids)
+            self.metrics.record_block(time_since_last, self.current_reward)
+            self.metrics.confirmed_transactions += len(included)
+            self.metrics.pending_transactions -= len(included)
+            self.metrics.record_confirmations(current_time, included)
+            if self.config.utxos:
+                self.metrics.utxo_count = self.ledger.utxo_count()
+                self.metrics.utxo_bytes = self.ledger.utxo_bytes()
             
             print(f"Block {block_id} mined by miner {miner.miner_id} at time {current_time:.2f}")
             
-            # Block propagation using network simulator
-            yield from self._propagate_block(block, miner.miner_id)
+            # Gossip the block to the other nodes; the miner keeps mining
+            self._propagate_block(block, miner.miner_id)
             
             # Remove confirmed transactions from pool
-            self.transaction_pool.remove_confirmed_transaction(set(included_tx_ids))
+            confirmed = {tx.transaction_id for tx in included}
+            self.transaction_pool.remove_confirmed_transaction(confirmed)
+            if self.relay:
+                self.relay.forget(confirmed)
+            if self.config.expiry:
+                self.transaction_pool.expire(self.env.now)
+            self.metrics.pool_sizes.add(self.transaction_pool.get_pool_size())
             
             # Difficulty adjustment every 2016 blocks
             blocks_since_retarget += 1
-            if blocks_since_retarget >= 2016:
+            if blocks_since_retarget >= RETARGET_WINDOW:
                 self._adjust_difficulty()
                 blocks_since_retarget = 0
             
@@ -172,58 +260,36 @@ class BlockchainSimulation:
             # Print progress
             if self.config.debug or len(self.blocks) % self.config.print == 0:
                 self._print_progress()
+            if self.timeseries and len(self.blocks) % self.config.tsevery == 0:
+                self._record_timeseries()
             
             self.last_block_time = current_time
             block_id += 1
     
-    def _wallet_process(self, wallet):
-        for tx_num in range(self.config.transactions):
-            # Generate transaction
-            receiver = (wallet.wallet_id + 1) % self.config.wallets
-            tx_id = f"{wallet.wallet_id}-{tx_num}"
-            
-            try:
-                wallet.send_transaction(
-                    receiver=receiver,
-                    amount=1.0,
-                    fee=0.01,
-                    pool=self.transaction_pool,
-                    timestamp=int(self.env.now),
-                    transaction_id=tx_id
-                )
-                self.metrics.total_transactions += 1
-                self.metrics.pending_transactions += 1
-            except ValueError:
-                # Insufficient balance
-                pass
-            
-            # Wait for interval
-            yield self.env.timeout(self.config.interval)
+    def _on_transaction_added(self, transaction):
+        # A wallet's transactions enter the network at node wallet_id % nodes
+        self.relay.submit(transaction)
+    
+    def _on_transaction_dropped(self, transaction, reason):
+        # The transaction will never confirm, so the sender gets its funds back
+        self.wallets[transaction.sender].refund_transaction(transaction)
+        if reason == "evicted":
+            self.metrics.evicted_transactions += 1
+        else:
+            self.metrics.expired_transactions += 1
+        self.metrics.pending_transactions -= 1
+        if self.relay:
+            self.relay.forget([transaction.transaction_id])
     
     def _propagate_block(self, block, miner_id):
-        # Simulate block propagation with network delays
-        if len(self.nodes) > 0:
-            start_node = miner_id % len(self.nodes)
-            
-            # Use network simulator for realistic propagation
-            for node in self.nodes:
-                if node.node_id != start_node:
-                    # Get propagation delay from network simulator
-                    delay = self.network_simulator.propagate_block(
-                        block, miner_id, self.nodes, self.metrics
-                    )
-                    
-                    if delay > 0:
-                        yield self.env.timeout(delay)
-                    
-                    # Node receives block
-                    node.receive_block(block, self.nodes)
+        if self.nodes:
+            elapsed = self.gossip.broadcast(block, miner_id % len(self.nodes), self.metrics)
+            self.metrics.propagation_times.add(elapsed)
     
     def _adjust_difficulty(self):
-        if len(self.metrics.block_times) >= 2016:
-            recent_times = self.metrics.block_times[-2016:]
-            actual_time = sum(recent_times)
-            target_time = self.config.blocktime * 2016
+        if self.metrics.block_window.is_full():
+            actual_time = self.metrics.block_window.total
+            target_time = self.config.blocktime * RETARGET_WINDOW
             
             self.current_difficulty = int(
                 self.current_difficulty * (target_time / actual_time)
@@ -246,12 +312,43 @@ class BlockchainSimulation:
         
         print(f"[{current_time:.2f}] Sum B:{blocks_completed}/{self.config.blocks} "
               f"{completion_pct:.1f}% abt:{avg_block_time:.2f}s tps:{tps:.2f} "
-              f"infl:{inflation:.2f}% ETA:{eta:.2f}s "
+              f"infl:{format_inflation(inflation)} ETA:{eta:.2f}s "
               f"Diff:{self.current_difficulty/1000000:.1f}M "
               f"H:{self.config.miners * self.config.hashrate/1000000:.0f}M "
               f"Tx:{self.metrics.total_transactions} C:{self.metrics.coin_supply:.0f} "
               f"Pool:{self.metrics.pending_transactions} "
-              f"NMB:{self.metrics.network_data:.2f} IO:{self.metrics.io_requests}")
+              f"NMB:{self.metrics.network_data:.2f} IO:{self.metrics.io_requests}"
+              f"{self._utxo_summary()}{self._quantile_summary()}")
+    
+    def _record_timeseries(self):
+        metrics = self.metrics
+        now = self.env.now
+        latency, interval, propagation, pool = (
+            sketch.quantiles() if sketch.count else [0.0] * 3
+            for sketch in (metrics.confirmation_latency, metrics.block_intervals,
+                           metrics.propagation_times, metrics.pool_sizes)
+        )
+        self.timeseries.record((
+            now, len(self.blocks), metrics.total_transactions, metrics.confirmed_transactions,
+            metrics.pending_transactions, metrics.coin_supply, metrics.get_average_block_time(),
+            metrics.get_tps(now), metrics.get_inflation_rate(), self.current_difficulty,
+            metrics.network_data, metrics.io_requests, metrics.evicted_transactions,
+            metrics.expired_transactions, metrics.skipped_transactions, metrics.utxo_count,
+            metrics.utxo_bytes, *latency, *interval, *propagation, *pool,
+            metrics.relay_messages, metrics.relay_bytes / 1000000, metrics.retransmitted_packets,
+        ))
+    
+    def _quantile_summary(self):
+        # p50/p95/p99 of confirmation latency, block interval, propagation time and pool size
+        return (f" CL:{format_quantiles(self.metrics.confirmation_latency)}s"
+                f" BI:{format_quantiles(self.metrics.block_intervals)}s"
+                f" PT:{format_quantiles(self.metrics.propagation_times, 3)}s"
+                f" PS:{format_quantiles(self.metrics.pool_sizes, 0)}")
+    
+    def _utxo_summary(self):
+        if not self.config.utxos:
+            return ""
+        return f" UTXO:{self.metrics.utxo_count} UMB:{self.metrics.utxo_bytes / 1000000:.2f}"
     
     def _print_final_summary(self, start_time):
         current_time = self.env.now
@@ -260,14 +357,38 @@ class BlockchainSimulation:
         simulation_time = time.time() - start_time
         
         print(f"[******] End B:{len(self.blocks)}/{self.config.blocks} 100.0% "
-              f"abt:{avg_block_time:.2f}s tps:{tps:.2f} infl:0.00% "
+              f"abt:{avg_block_time:.2f}s tps:{tps:.2f} infl:{format_inflation(self.metrics.get_inflation_rate())} "
               f"Diff:{self.current_difficulty/1000000:.1f}M "
               f"H:{self.config.miners * self.config.hashrate/1000000:.0f}M "
               f"Tx:{self.metrics.total_transactions} C:{self.metrics.coin_supply:.0f} "
               f"Pool:{self.metrics.pending_transactions} "
-              f"NMB:{self.metrics.network_data:.2f} IO:{self.metrics.io_requests}")
+              f"NMB:{self.metrics.network_data:.2f} IO:{self.metrics.io_requests}"
+              f"{self._utxo_summary()}{self._quantile_summary()}")
         
         print(f"\nSimulation completed in {simulation_time:.2f} seconds")
         print(f"Total blocks mined: {len(self.blocks)}")
         print(f"Total transactions: {self.metrics.total_transactions}")
-        print(f"Total coins created: {self.metrics.coin_supply:.2f}")
\ No newline at end of file
+        print(f"Total coins created: {self.metrics.coin_supply:.2f}")
+        print(f"Fee rate estimate: {self.transaction_pool.estimate_fee(1):.2e}/byte (next block), "
+              f"{self.transaction_pool.estimate_fee(6):.2e}/byte (6 blocks)")
+        if self.metrics.evicted_transactions or self.metrics.expired_transactions:
+            print(f"Transactions evicted: {self.metrics.evicted_transactions}, "
+                  f"expired: {self.metrics.expired_transactions}")
+        if self.metrics.skipped_transactions:
+            print(f"Sends skipped for lack of funds: {self.metrics.skipped_transactions}, "
+                  f"wallets still parked: {self.ledger.parked_count()}")
+        print("Percentiles (p50/p95/p99):")
+        print(f"  Confirmation latency: {format_quantiles(self.metrics.confirmation_latency)}s "
+              f"over {self.metrics.confirmation_latency.count} transactions")
+        print(f"  Block interval: {format_quantiles(self.metrics.block_intervals)}s")
+        print(f"  Propagation time: {format_quantiles(self.metrics.propagation_times, 3)}s")
+        print(f"  Pool size: {format_quantiles(self.metrics.pool_sizes, 0)} transactions")
+        if self.relay:
+            print(f"Transaction relay: {self.metrics.relay_messages} messages, "
+                  f"{self.metrics.relay_bytes / 1000000:.2f} MB, "
+                  f"{self.relay.coverage() * 100:.1f}% of nodes reached per batch, "
+                  f"{self.relay.mempool_sizes.mean():.1f} pending transactions per node mempool")
+        if self.metrics.retransmitted_packets:
+            print(f"Packets lost and sent again: {self.metrics.retransmitted_packets}")
+        print(f"Miner balances: {self.ledger.miner_balances().sum():.2f} "
+              f"across {self.config.miners} miners")
\ No newline at end of file
@@ -0,0 +1,103 @@
+import math
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+# Values are bucketed on a log scale, each bucket SKETCH_GAMMA times wider
+# than the previous one, so a quantile is returned within SKETCH_ACCURACY
+# relative error (as in DDSketch / HDR histograms). The bucket range covers
+# SKETCH_MIN_VALUE..SKETCH_MAX_VALUE; smaller values share the zero bucket
+# and larger ones the last bucket.
+SKETCH_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+SKETCH_MIN_VALUE = 1e-3
+SKETCH_MAX_VALUE = 1e9
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+_LOG_MIN_VALUE = math.log(SKETCH_MIN_VALUE)
+SKETCH_BUCKETS = int(math.ceil((math.log(SKETCH_MAX_VALUE) - _LOG_MIN_VALUE) / _LOG_GAMMA)) + 2
+
+@dataclass
+class QuantileSketch:
+    """Mergeable streaming quantiles of non-negative samples.
+
+    Memory is a fixed array of SKETCH_BUCKETS counts whatever the number
+    of samples; two sketches merge by adding their counts, so sketches of
+    parallel runs (or pickled ones) combine into the sketch of all samples.
+    """
+    counts: np.ndarray = field(default_factory=lambda: np.zeros(SKETCH_BUCKETS, dtype=np.int64), repr=False)
+    count: int = 0
+    total: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+
+
+    def add(self, value):
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def add_many(self, values: Iterable[float]):
+        """Vectorized add of an array of samples"""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self.counts += np.bincount(self.buckets(values), minlength=SKETCH_BUCKETS)
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: "QuantileSketch"):
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @classmethod
+    def merged(cls, sketches: Iterable["QuantileSketch"]) -> "QuantileSketch":
+        result = cls()
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+
+
+    @staticmethod
+    def bucket(value):
+        if value <= SKETCH_MIN_VALUE:
+            return 0
+        bucket = int(math.ceil((math.log(value) - _LOG_MIN_VALUE) / _LOG_GAMMA))
+        return bucket if bucket < SKETCH_BUCKETS else SKETCH_BUCKETS - 1
+
+    @staticmethod
+    def buckets(values: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore"):
+            buckets = np.ceil((np.log(np.maximum(values, SKETCH_MIN_VALUE)) - _LOG_MIN_VALUE) / _LOG_GAMMA)
+        return np.clip(buckets, 0, SKETCH_BUCKETS - 1).astype(np.intp)
+
+    @staticmethod
+    def bucket_value(bucket):
+        """Value reported for a bucket, within SKETCH_ACCURACY of all its samples"""
+        if bucket == 0:
+            return 0.0
+        return 2 * SKETCH_MIN_VALUE * SKETCH_GAMMA ** bucket / (SKETCH_GAMMA + 1)
+
+
+    def quantile(self, q) -> Optional[float]:
+        """Sample value at quantile q in [0, 1], None for an empty sketch"""
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99)):
+        if not self.count:
+            return [None] * len(qs)
+        cumulative = np.cumsum(self.counts)
+        buckets = np.searchsorted(cumulative, [q * (self.count - 1) for q in qs], side="right")
+        return [min(max(self.bucket_value(int(bucket)), self.min), self.max) for bucket in buckets]
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
@@ -0,0 +1,99 @@
+import numpy as np
+from typing import Sequence
+
+# Each level holds the points of the level below averaged DOWNSAMPLE_FACTOR
+# at a time, so level k has one point per DOWNSAMPLE_FACTOR**k samples.
+# Levels are ring buffers of LEVEL_POINTS rows, so a long run keeps its
+# recent history at full resolution and older history coarser, in fixed
+# memory, like a round-robin database.
+DOWNSAMPLE_FACTOR = 10
+DOWNSAMPLE_LEVELS = 4
+LEVEL_POINTS = 100_000
+FLUSH_ROWS = 4096
+
+class TimeSeriesWriter:
+    """Records rows of metrics to PATH.csv and, on close, PATH.npz.
+
+    The CSV holds every sample; rows are buffered in a NumPy array and
+    written FLUSH_ROWS at a time. The .npz holds the downsampled levels:
+    "columns", "samples_per_point" and one "levelK" array of shape
+    (points, columns) per level, oldest point first. Columns named in
+    mean_columns are averaged when downsampling; the others (times and
+    running totals) keep the last value of each window.
+    """
+
+    def __init__(self, path, columns: Sequence[str], mean_columns=(), levels=DOWNSAMPLE_LEVELS,
+                 points=LEVEL_POINTS, flush_rows=FLUSH_ROWS):
+        self.path = path
+        self.columns = list(columns)
+        self._mean = np.isin(self.columns, list(mean_columns))
+        self._csv = open(path + ".csv", "w")
+        self._csv.write(",".join(self.columns) + "\n")
+        self._buffer = np.empty((flush_rows, len(self.columns)))
+        self._buffered = 0
+        self._levels = [np.empty((points, len(self.columns))) for _ in range(levels)]
+        self._level_counts = [0] * levels  # points ever stored per level
+        # Running sums of the samples of the open window of each level above 0
+        self._sums = np.zeros((levels, len(self.columns)))
+        self._window_counts = [0] * levels
+        self.samples = 0
+
+
+    def record(self, values: Sequence[float]):
+        row = np.asarray(values, dtype=np.float64)
+        self._buffer[self._buffered] = row
+        self._buffered += 1
+        if self._buffered == len(self._buffer):
+            self.flush()
+        self.samples += 1
+        self._store(0, row)
+
+    def flush(self):
+        if self._buffered:
+            np.savetxt(self._csv, self._buffer[:self._buffered], delimiter=",", fmt="%.10g")
+            self._buffered = 0
+
+    def close(self):
+        if self._csv.closed:
+            return
+        self.flush()
+        self._csv.close()
+        # Emit the partly filled windows so the last samples are not lost
+        for level in range(1, len(self._levels)):
+            if self._window_counts[level]:
+                self._store(level, self._window_row(level))
+        arrays = {f"level{level}": self.level(level) for level in range(len(self._levels))}
+        np.savez(self.path + ".npz", columns=np.array(self.columns),
+                 samples_per_point=DOWNSAMPLE_FACTOR ** np.arange(len(self._levels)), **arrays)
+
+
+    def level(self, level) -> np.ndarray:
+        """Points of a level, oldest first"""
+        stored = self._level_counts[level]
+        points = self._levels[level]
+        if stored <= len(points):
+            return points[:stored].copy()
+        start = stored % len(points)
+        return np.concatenate((points[start:], points[:start]))
+
+
+    def _store(self, level, row):
+        points = self._levels[level]
+        points[self._level_counts[level] % len(points)] = row
+        self._level_counts[level] += 1
+        upper = level + 1
+        if upper == len(self._levels):
+            return
+        self._sums[upper] += row
+        self._window_counts[upper] += 1
+        if self._window_counts[upper] == DOWNSAMPLE_FACTOR:
+            self._store(upper, self._window_row(upper, row))
+
+    def _window_row(self, level, last=None):
+        """Downsampled row of the open window of a level, which is then reset"""
+        if last is None:
+            last = self._levels[level - 1][(self._level_counts[level - 1] - 1) % len(self._levels[level - 1])]
+        row = np.where(self._mean, self._sums[level] / self._window_counts[level], last)
+        self._sums[level] = 0
+        self._window_counts[level] = 0
+        return row
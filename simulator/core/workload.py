@@ -0,0 +1,145 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from simulator.blockchain.transaction import TRANSACTION_SIZE_BYTES
+
+@dataclass
+class TransactionBatch:
+    """Time-ordered transaction attributes, one array entry per transaction"""
+    times: np.ndarray
+    senders: np.ndarray
+    tx_nums: np.ndarray
+    receivers: np.ndarray
+    amounts: np.ndarray
+    fees: np.ndarray
+    sizes: np.ndarray
+    chained: np.ndarray
+
+    def __len__(self):
+        return len(self.times)
+
+    def take(self, index):
+        return TransactionBatch(*(values[index] for values in (
+            self.times, self.senders, self.tx_nums, self.receivers,
+            self.amounts, self.fees, self.sizes, self.chained)))
+
+    @staticmethod
+    def concatenate(first, second):
+        return TransactionBatch(*(np.concatenate((a, b)) for a, b in zip(
+            (first.times, first.senders, first.tx_nums, first.receivers,
+             first.amounts, first.fees, first.sizes, first.chained),
+            (second.times, second.senders, second.tx_nums, second.receivers,
+             second.amounts, second.fees, second.sizes, second.chained))))
+
+
+class WorkloadGenerator:
+    """Draws the transactions of all wallets in vectorized chunks.
+
+    Every wallet sends config.transactions transactions. Interarrival times
+    are fixed (config.interval) or exponential with that mean ("poisson").
+    Receivers are the next wallet, uniform, or Zipf-distributed over wallet
+    ids. Amounts and fees are lognormal around config.amount / config.fee
+    with sigma config.dispersion, which is constant at 0. Sizes follow
+    config.txsizes. Each chunk covers a few rounds (one transaction per
+    wallet) and is merged in time order with what the previous chunk could
+    not emit yet, so the stream is produced as the simulation consumes it.
+    """
+
+    def __init__(self, config, rng: Optional[np.random.Generator] = None):
+        self.config = config
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.wallets = config.wallets
+        self.rounds_per_chunk = max(1, config.chunk // self.wallets)
+
+        if config.txsizes:
+            self.sizes = np.array([entry["size_bytes"] for entry in config.txsizes.values()], dtype=np.int64)
+            probabilities = np.array([entry["probability"] for entry in config.txsizes.values()], dtype=float)
+            self.size_probabilities = probabilities / probabilities.sum()
+        else:
+            self.sizes = np.array([config.txsize or TRANSACTION_SIZE_BYTES], dtype=np.int64)
+            self.size_probabilities = None
+
+        if config.receivers == "zipf":
+            weights = 1.0 / np.arange(1, self.wallets + 1) ** config.zipf
+            self.receiver_cdf = np.cumsum(weights / weights.sum())
+
+    @staticmethod
+    def is_default(config):
+        """True when the per-wallet processes can send the same streams"""
+        return config.arrivals == "fixed" and config.receivers == "next" and not config.dispersion
+
+
+    def batches(self) -> Iterator[TransactionBatch]:
+        """Yield time-ordered batches until every wallet has sent all its transactions"""
+        senders = np.arange(self.wallets)
+        if self.config.arrivals == "poisson":
+            next_times = self.rng.exponential(self.config.interval, self.wallets)
+        else:
+            next_times = np.zeros(self.wallets)
+        carry = None
+        for first_round in range(0, self.config.transactions, self.rounds_per_chunk):
+            rounds = min(self.rounds_per_chunk, self.config.transactions - first_round)
+            batch, next_times = self._draw(senders, next_times, first_round, rounds)
+            if carry is not None:
+                batch = TransactionBatch.concatenate(carry, batch)
+                batch = batch.take(np.argsort(batch.times, kind="stable"))
+            if first_round + rounds >= self.config.transactions:
+                yield batch
+                return
+            # Later chunks only hold transactions at or after the earliest
+            # next send time, so everything before it is final
+            ready = int(np.searchsorted(batch.times, next_times.min(), side="left"))
+            carry = batch.take(slice(ready, None))
+            if ready:
+                yield batch.take(slice(0, ready))
+
+
+    def _draw(self, senders, next_times, first_round, rounds):
+        """Draw rounds transactions for every wallet, flattened round by round"""
+        shape = (rounds, self.wallets)
+        if self.config.arrivals == "poisson":
+            gaps = self.rng.exponential(self.config.interval, shape)
+        else:
+            gaps = np.full(shape, float(self.config.interval))
+        times = next_times + np.cumsum(gaps, axis=0) - gaps
+        next_times = times[-1] + gaps[-1]
+
+        count = rounds * self.wallets
+        sender_ids = np.tile(senders, rounds)
+        order = np.argsort(times.ravel(), kind="stable")
+        batch = TransactionBatch(
+            times=times.ravel(),
+            senders=sender_ids,
+            tx_nums=np.repeat(np.arange(first_round, first_round + rounds), self.wallets),
+            receivers=self._draw_receivers(sender_ids),
+            amounts=self._draw_values(self.config.amount, count),
+            fees=self._draw_values(self.config.fee, count),
+            sizes=self._draw_sizes(count),
+            chained=self.rng.random(count) < self.config.chaining if self.config.chaining else np.zeros(count, dtype=bool)
+        )
+        return batch.take(order), next_times
+
+
+    def _draw_receivers(self, senders):
+        if self.config.receivers == "uniform":
+            receivers = self.rng.integers(0, max(1, self.wallets - 1), len(senders))
+            # Skip the sender itself
+            return receivers + (receivers >= senders) if self.wallets > 1 else receivers
+        if self.config.receivers == "zipf":
+            receivers = np.searchsorted(self.receiver_cdf, self.rng.random(len(senders)), side="right")
+            receivers = np.minimum(receivers, self.wallets - 1)
+            return np.where(receivers == senders, (receivers + 1) % self.wallets, receivers)
+        return (senders + 1) % self.wallets
+
+    def _draw_values(self, mean, count):
+        if not self.config.dispersion:
+            return np.full(count, float(mean))
+        sigma = self.config.dispersion
+        # Lognormal with the given mean
+        return mean * self.rng.lognormal(-sigma * sigma / 2, sigma, count)
+
+    def _draw_sizes(self, count):
+        if self.size_probabilities is None:
+            return np.full(count, self.sizes[0])
+        return self.rng.choice(self.sizes, size=count, p=self.size_probabilities)
@@ -0,0 +1,71 @@
+import numpy as np
+from typing import Dict, List
+
+# Region of nodes in scenarios without a node_distribution
+DEFAULT_REGION = "global"
+# Distribution codes of the compiled region pairs
+UNIFORM, NORM, LOGNORM, INVGAMMA = range(4)
+_DISTRIBUTIONS = {"norm": NORM, "lognorm": LOGNORM, "invgamma": INVGAMMA}
+
+class LatencySampler:
+    """Region-pair latency distributions compiled into arrays.
+
+    Pair i * len(regions) + j holds the distribution of latencies from
+    region i to region j, in ms, with the parameters of
+    config/network/latency.json (scipy conventions: norm (loc, scale),
+    lognorm and invgamma (shape, loc, scale)) and clipped to its
+    min_ms..max_ms. Pairs missing from the file use the reverse pair, then
+    the uniform "local" latency profile of network.json within a region or
+    the "global" one across regions.
+    """
+
+    def __init__(self, regions: List[str], locations: Dict, latency_profiles: Dict):
+        self.regions = list(regions)
+        pairs = len(self.regions) ** 2
+        self.kinds = np.empty(pairs, dtype=np.int8)
+        self.parameters = np.zeros((pairs, 3))
+        self.low = np.empty(pairs)
+        self.high = np.empty(pairs)
+        for i, source in enumerate(self.regions):
+            for j, target in enumerate(self.regions):
+                pair = self.pair(i, j)
+                entry = locations.get(source, {}).get(target) or locations.get(target, {}).get(source)
+                if entry is None:
+                    name = "local" if source == target and source != DEFAULT_REGION else "global"
+                    profile = latency_profiles.get(name, latency_profiles["global"])
+                    self.kinds[pair] = UNIFORM
+                    self.low[pair], self.high[pair] = profile["min_ms"], profile["max_ms"]
+                    self.parameters[pair, :2] = self.low[pair], self.high[pair]
+                    continue
+                parameters = _parse_parameters(entry["parameters"])
+                self.kinds[pair] = _DISTRIBUTIONS[entry["distribution"]]
+                self.parameters[pair, :len(parameters)] = parameters
+                self.low[pair], self.high[pair] = entry["min_ms"], entry["max_ms"]
+
+
+    def pair(self, source, target):
+        return source * len(self.regions) + target
+
+    def sample(self, pairs: np.ndarray, rng) -> np.ndarray:
+        """One latency in ms per entry of an array of pair indices"""
+        latencies = np.empty(len(pairs))
+        for pair in np.unique(pairs):
+            mask = pairs == pair
+            latencies[mask] = self._draw(pair, int(mask.sum()), rng)
+        return np.clip(latencies, self.low[pairs], self.high[pairs])
+
+    def _draw(self, pair, count, rng):
+        first, second, third = self.parameters[pair]
+        kind = self.kinds[pair]
+        if kind == NORM:
+            return rng.normal(first, second, count)
+        if kind == LOGNORM:
+            return second + third * np.exp(first * rng.standard_normal(count))
+        if kind == INVGAMMA:
+            return second + third / rng.gamma(first, 1.0, count)
+        return rng.uniform(first, second, count)
+
+
+def _parse_parameters(text):
+    """Parameters are stored as a tuple literal, e.g. "(45.5, 8.2)" """
+    return [float(value) for value in text.strip("() ").split(",") if value.strip()]
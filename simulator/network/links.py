@@ -0,0 +1,62 @@
+import numpy as np
+
+from simulator.network.topology import Graph
+
+# Payload bytes per packet; a lost packet is sent again in full
+PACKET_BYTES = 1460
+
+class LinkQueues:
+    """FIFO transfer queues of the directed links, as next-free times.
+
+    Link i runs from sources[i] to targets[i] in the CSR order of the
+    topology, with the packet loss of both ends. A node sends to all its
+    peers at once, so each of its links gets an equal share of its uplink,
+    and both the transmission time of a transfer and the time it keeps its
+    link busy are its bytes, packets lost and sent again included, over
+    that share. A transfer starts once its link is free and with lost
+    packets completes one round trip later. Each link is one float of
+    next_free, so a whole broadcast updates its links in a single
+    vectorized step.
+    """
+
+    def __init__(self, graph: Graph, uplinks, loss, rng: np.random.Generator):
+        node_count = graph.node_count
+        self.sources = np.repeat(np.arange(node_count), graph.degrees())
+        self.targets = graph.indices
+        self.rng = rng
+        self.rates = (uplinks / np.maximum(graph.degrees(), 1))[self.sources]  # bytes per second per link
+        self.delivery = (1 - loss[self.sources]) * (1 - loss[self.targets])
+        self.next_free = np.zeros(len(self.targets))
+        # Sorted, since CSR rows are sorted: the link of (source, target) is a binary search
+        self._keys = self.sources * node_count + self.targets
+        self._node_count = node_count
+
+
+    def link_index(self, sources, targets) -> np.ndarray:
+        return np.searchsorted(self._keys, np.asarray(sources) * self._node_count + targets)
+
+    def waits(self, starts) -> np.ndarray:
+        """Seconds every link waits until it is free, for transfers ready at starts"""
+        return np.maximum(self.next_free - starts, 0)
+
+    def transfer_times(self, links, sizes, latencies):
+        """Transmission and loss recovery seconds, and lost packets, of sizes bytes on links
+
+        latencies are the one-way latencies of those links in seconds.
+        """
+        packets = np.maximum(np.ceil(np.asarray(sizes) / PACKET_BYTES), 1)
+        lost = self.rng.negative_binomial(packets, self.delivery[links])
+        transmission = (sizes + lost * PACKET_BYTES) / self.rates[links]
+        recovery = np.where(lost > 0, 2 * latencies, 0.0)
+        return transmission, recovery, lost
+
+    def occupy(self, links, starts, seconds):
+        """Queue transfers ready at starts that take seconds of transmission on links
+
+        A link is busy from its earliest start for the seconds of all its transfers.
+        """
+        first = np.full(len(self.next_free), np.inf)
+        np.minimum.at(first, links, starts)
+        busy = np.bincount(links, weights=seconds, minlength=len(self.next_free))
+        used = np.flatnonzero(busy)
+        self.next_free[used] = np.maximum(self.next_free[used], first[used]) + busy[used]
@@ -1,14 +1,31 @@
 import simpy
-import random
 import json
+import numpy as np
 from typing import Dict, List
 
+from simulator.network.latency import DEFAULT_REGION, LatencySampler
+
+# Relative spread of a message's latency around its link's base latency
+# (lognormal sigma)
+LATENCY_JITTER = 0.1
+# Uplink of a transfer when node profiles are not assigned
+DEFAULT_BANDWIDTH_MBPS = 100
+# Profile option that draws one profile per node
+MIXED_PROFILE = "mixed"
+
 class NetworkSimulator:
     """Enhanced network simulation for extra credit"""
     
-    def __init__(self, config):
+    def __init__(self, config, rng: np.random.Generator = None):
         self.config = config
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.load_network_configs()
+        # Set by assign_regions once the nodes exist
+        self.latency_sampler = None
+        self.node_regions = None
+        # Set by assign_bandwidth: uplink in bytes per second and packet loss per node
+        self.node_uplinks = None
+        self.node_loss = None
     
     def load_network_configs(self):
         """Load network configuration from JSON files"""
@@ -26,6 +43,52 @@ class NetworkSimulator:
                 }
             }
             self.latency_config = {}
+        try:
+            with open('config/network/topology.json', 'r') as f:
+                self.topology_config = json.load(f)
+        except FileNotFoundError:
+            self.topology_config = {}
+        if self.topology_config and self.config.topology not in self.topology_config:
+            raise ValueError(f"Unknown topology scenario: {self.config.topology}")
+    
+    def assign_regions(self, nodes):
+        """Draw each node's region from the scenario's node_distribution"""
+        scenario = self.topology_config.get(self.config.topology, {})
+        distribution = scenario.get("node_distribution") or {DEFAULT_REGION: 1.0}
+        regions = list(distribution)
+        weights = np.array([distribution[region] for region in regions], dtype=float)
+        self.latency_sampler = LatencySampler(
+            regions, self.latency_config.get("locations", {}), self.network_config["latency_profiles"]
+        )
+        self.node_regions = self.rng.choice(len(regions), size=len(nodes), p=weights / weights.sum())
+        for node, region in zip(nodes, self.node_regions):
+            node.region = regions[region]
+    
+    def assign_bandwidth(self, node_count):
+        """Draw each node's uplink and packet loss from the bandwidth and loss profiles"""
+        self.node_uplinks = self._draw_profile("bandwidth_profiles", self.config.bandwidth, node_count) * 1e6 / 8
+        self.node_loss = self._draw_profile("packet_loss_profiles", self.config.loss, node_count)
+    
+    def _draw_profile(self, profiles_key, name, node_count) -> np.ndarray:
+        profiles = self.network_config.get(profiles_key)
+        if not profiles:
+            default = DEFAULT_BANDWIDTH_MBPS if profiles_key == "bandwidth_profiles" else 0.0
+            return np.full(node_count, float(default))
+        if name == MIXED_PROFILE:
+            return self.rng.choice(np.array(list(profiles.values()), dtype=float), size=node_count)
+        if name not in profiles:
+            raise ValueError(f"Unknown {profiles_key} entry: {name}")
+        return np.full(node_count, float(profiles[name]))
+    
+    def base_latencies(self, sources, targets) -> np.ndarray:
+        """Base latency in ms of each link sources[i] -> targets[i], drawn once per undirected edge"""
+        sources, targets = np.asarray(sources), np.asarray(targets)
+        low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+        # Both directions of an edge share one draw
+        _, first, inverse = np.unique(low.astype(np.int64) * (int(high.max(initial=0)) + 1) + high,
+                                      return_index=True, return_inverse=True)
+        pairs = self.latency_sampler.pair(self.node_regions[low[first]], self.node_regions[high[first]])
+        return self.latency_sampler.sample(pairs, self.rng).astype(np.float32)[inverse]
     
     def propagate_block(self, block, start_node_id, nodes, metrics):
         """Simulate realistic block propagation"""
@@ -37,7 +100,7 @@ class NetworkSimulator:
                 latency = self.get_network_latency(start_node_id, node_id)
                 
                 # Calculate bandwidth delay based on block size
-                bandwidth_delay = self.get_bandwidth_delay(block.header.size)
+                bandwidth_delay = self.get_bandwidth_delay(block.header.size, start_node_id)
                 
                 # Total propagation delay in seconds
                 delay = (latency + bandwidth_delay) / 1000
@@ -51,11 +114,23 @@ class NetworkSimulator:
     
     def get_network_latency(self, from_node: int, to_node: int) -> float:
         """Calculate network latency between nodes in milliseconds"""
+        if self.node_regions is not None and max(from_node, to_node) < len(self.node_regions):
+            return float(self.base_latencies(np.array([from_node]), np.array([to_node]))[0])
         profile = self.network_config["latency_profiles"]["global"]
-        return random.uniform(profile["min_ms"], profile["max_ms"])
+        return float(self.rng.uniform(profile["min_ms"], profile["max_ms"]))
+    
+    def link_latencies(self, base_latencies) -> np.ndarray:
+        """One-way latencies in seconds of links with these base latencies.
+
+        The jitter of all links is drawn in one batch.
+        """
+        jitter = np.exp(LATENCY_JITTER * self.rng.standard_normal(len(base_latencies)))
+        return base_latencies * jitter / 1000
     
-    def get_bandwidth_delay(self, block_size_bytes: int) -> float:
-        """Calculate bandwidth delay based on block size"""
-        bandwidth_mbps = 100  # 100 Mbps average
-        bandwidth_bytes_per_ms = (bandwidth_mbps * 1000000) / (8 * 1000)
+    def get_bandwidth_delay(self, block_size_bytes: int, from_node=None) -> float:
+        """Milliseconds to send block_size_bytes over from_node's uplink"""
+        if self.node_uplinks is not None and from_node is not None and from_node < len(self.node_uplinks):
+            bandwidth_bytes_per_ms = self.node_uplinks[from_node] / 1000
+        else:
+            bandwidth_bytes_per_ms = (DEFAULT_BANDWIDTH_MBPS * 1000000) / (8 * 1000)
         return block_size_bytes / bandwidth_bytes_per_ms
\ No newline at end of file
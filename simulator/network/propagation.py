@@ -0,0 +1,85 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from typing import List
+
+from simulator.blockchain.block import Block
+from simulator.blockchain.nodes import Node
+from simulator.blockchain.inventory import BlockInventory
+from simulator.network.links import PACKET_BYTES, LinkQueues
+from simulator.network.topology import Graph
+
+# Arrivals within one tick are delivered by a single SimPy timeout, which
+# bounds the events per block at large node counts
+GOSSIP_TICK = 0.01
+
+class GossipEngine:
+    """Hop-by-hop block propagation over the neighbor links.
+
+    Every broadcast draws one delay per directed link (queueing behind
+    earlier transfers, transmission with lost packets, latency) and runs
+    Dijkstra from the origin, giving each node the earliest time the block
+    can reach it through its neighbors. Each node downloads the block over
+    the last link of its path, which keeps that link busy. Queue waits are
+    taken at the time the block would reach each sender over idle links,
+    from a first Dijkstra pass without waits. Deliveries run in a separate
+    SimPy process, so the miner never waits on the network.
+    """
+
+    def __init__(self, env, nodes: List[Node], graph: Graph, inventory: BlockInventory, network,
+                 links: LinkQueues):
+        self.env = env
+        self.nodes = nodes
+        self.inventory = inventory
+        self.network = network
+        self.links = links
+        # Directed links: both directions of every edge of the topology
+        self.indptr = graph.indptr
+        self.indices = graph.indices
+        # Base latency of every link, in ms; broadcasts add jitter and transfer time
+        sources = np.repeat(np.arange(len(nodes)), graph.degrees())
+        self.base_latencies = network.base_latencies(sources, self.indices)
+        # Reused for every broadcast; only its data (the link delays) changes
+        self._graph = csr_matrix((np.ones(len(self.indices)), self.indices, self.indptr),
+                                 shape=(len(nodes), len(nodes)))
+
+
+    def broadcast(self, block: Block, origin, metrics) -> float:
+        """Start gossiping block from origin; returns the time to reach every reachable node"""
+        self.inventory.receive(origin, block.header.block_id)
+        now = self.env.now
+        size = block.header.size
+        latencies = self.network.link_latencies(self.base_latencies)
+        transmission, recovery, lost = self.links.transfer_times(slice(None), size, latencies)
+        delays = transmission + recovery + latencies
+        self._graph.data = delays
+        idle = dijkstra(self._graph, directed=True, indices=origin)
+        self._graph.data = delays + self.links.waits(now + idle[self.links.sources])
+        # Seconds until each node has the block (inf if unreachable) and the node it came from
+        times, predecessors = dijkstra(self._graph, directed=True, indices=origin, return_predecessors=True)
+        reached = np.flatnonzero(np.isfinite(times))
+        # Every reached node but the origin downloads the block once
+        receivers = reached[reached != origin]
+        senders = predecessors[receivers]
+        links = self.links.link_index(senders, receivers)
+        self.links.occupy(links, now + times[senders], transmission[links])
+        retransmitted = int(lost[links].sum())
+        metrics.retransmitted_packets += retransmitted
+        metrics.io_requests += len(receivers)
+        metrics.network_data += (len(receivers) * size + retransmitted * PACKET_BYTES) / (1024 * 1024)  # MB
+        if len(receivers):
+            self.env.process(self._deliver(block, reached, times[reached]))
+        return float(times[reached].max())
+
+    def _deliver(self, block, reached, times):
+        order = np.argsort(times, kind="stable")
+        ticks = np.ceil(times[order] / GOSSIP_TICK)
+        # Boundaries of the runs of nodes that share a tick
+        starts = np.flatnonzero(np.diff(ticks, prepend=-1))
+        ends = np.append(starts[1:], len(order))
+        start_time = self.env.now
+        for start, end in zip(starts, ends):
+            delay = start_time + ticks[start] * GOSSIP_TICK - self.env.now
+            if delay > 0:
+                yield self.env.timeout(delay)
+            self.inventory.receive_many(reached[order[start:end]], block.header.block_id)
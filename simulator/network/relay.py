@@ -0,0 +1,253 @@
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order
+from typing import Dict, Iterable, List, Tuple
+
+from simulator.network.links import PACKET_BYTES, LinkQueues
+from simulator.network.topology import Graph
+
+# Message sizes of the Bitcoin P2P protocol: every message has a 24-byte
+# header, INV and GETDATA carry one 36-byte entry per transaction
+MESSAGE_HEADER_BYTES = 24
+INV_ENTRY_BYTES = 36
+# Spread orders kept for the origins that batched most recently
+RELAY_CACHED_TREES = 1024
+
+
+@dataclass
+class RelayTree:
+    """How a batch spreads from its origin, one hop per tick.
+
+    The nodes at hop h are order[offsets[h]:offsets[h + 1]], origin first;
+    links[i] is the CSR link order[i] fetches the batch over (0 for the
+    origin), and announcements[h] the INV messages the nodes at hop h get,
+    one from each peer that got the batch a tick earlier.
+    """
+    order: np.ndarray
+    offsets: np.ndarray
+    links: np.ndarray
+    announcements: np.ndarray
+
+    @property
+    def hops(self):
+        return len(self.offsets) - 1
+
+
+class TransactionRelay:
+    """INV/GETDATA transaction relay over the topology, in trickle ticks.
+
+    The transactions an origin node (the sender's wallet id modulo the node
+    count) gets during a tick form one batch of that origin. Every tick,
+    each node that got a batch in the previous tick announces it in one INV
+    per peer that does not have it yet; each of those requests it with
+    GETDATA from one announcer, receives its TX messages and announces it on
+    the next tick. A batch thus spreads along the breadth-first order of its
+    origin, which is computed once per origin and cached, so a tick costs
+    one slice per spreading batch instead of a pass over the links.
+    mempool_sizes holds the pending transactions every node has; confirmed
+    and dropped transactions leave it and stop spreading. The traffic is
+    added to network_data and io_requests, and the TX messages queue on
+    links, delaying block transfers behind them.
+    """
+
+    def __init__(self, env, graph: Graph, metrics, trickle, links: LinkQueues = None):
+        self.env = env
+        self.graph = graph
+        self.metrics = metrics
+        self.trickle = trickle
+        self.links = links
+        self.node_count = graph.node_count
+        self.mempool_sizes = np.zeros(self.node_count, dtype=np.int64)
+        self.inv_messages = 0
+        self.getdata_messages = 0
+        self.tx_messages = 0
+        self._sources = np.repeat(np.arange(self.node_count), graph.degrees())
+        self._matrix = csr_matrix((np.ones(len(graph.indices)), graph.indices, graph.indptr),
+                                  shape=(self.node_count, self.node_count))
+        self._trees: "OrderedDict[int, RelayTree]" = OrderedDict()
+        # Submitted transactions waiting for the next tick: id -> (origin, size)
+        self._waiting: Dict[int, Tuple[int, int]] = {}
+        # Batched pending transactions: id -> (batch, size)
+        self._transactions: Dict[int, Tuple[int, int]] = {}
+        # Per batch: pending transactions, their bytes, last hop reached, nodes it reaches
+        self.batch_counts = np.empty(1024, dtype=np.int64)
+        self.batch_bytes = np.empty(1024, dtype=np.int64)
+        self.batch_hops = np.empty(1024, dtype=np.int64)
+        self.batch_reached = np.empty(1024, dtype=np.int64)
+        self.batch_count = 0
+        # Spread orders of the batches still spreading, and of the finished
+        # ones that could not reach every node
+        self._spreading: Dict[int, RelayTree] = {}
+        self._partial: Dict[int, RelayTree] = {}
+        self._running = False
+
+
+    def submit(self, transaction):
+        self._waiting[transaction.transaction_id] = (transaction.sender % self.node_count, transaction.size)
+        if not self._running:
+            self._running = True
+            self.env.process(self._run())
+
+    def forget(self, transaction_ids: Iterable[int]):
+        """Drop confirmed or dropped transactions from every mempool that has them"""
+        removed: Dict[int, List[int]] = {}
+        for transaction_id in transaction_ids:
+            if self._waiting.pop(transaction_id, None) is not None:
+                continue
+            entry = self._transactions.pop(transaction_id, None)
+            if entry is not None:
+                removed.setdefault(entry[0], []).append(entry[1])
+        for batch, sizes in removed.items():
+            self.mempool_sizes[self._holders(batch)] -= len(sizes)
+            self.batch_counts[batch] -= len(sizes)
+            self.batch_bytes[batch] -= sum(sizes)
+            if not self.batch_counts[batch]:
+                self._spreading.pop(batch, None)
+                self._partial.pop(batch, None)
+
+    def knows(self, node, transaction_id) -> bool:
+        """Whether node has the pending transaction"""
+        if transaction_id in self._waiting:
+            return self._waiting[transaction_id][0] == node
+        if transaction_id not in self._transactions:
+            return False
+        holders = self._holders(self._transactions[transaction_id][0])
+        return isinstance(holders, slice) or node in holders
+
+    def coverage(self) -> float:
+        """Mean fraction of the nodes each batch reaches"""
+        if not self.batch_count:
+            return 0.0
+        return float(self.batch_reached[:self.batch_count].mean()) / self.node_count
+
+    def _run(self):
+        # Ticks while anything is waiting or spreading, then stops until
+        # the next submission
+        while self._waiting or self._spreading:
+            yield self.env.timeout(self.trickle)
+            if self._spreading:
+                self._spread()
+            if self._waiting:
+                self._start_batches()
+        self._running = False
+
+    def _start_batches(self):
+        waiting = list(self._waiting.items())
+        self._waiting.clear()
+        origins = np.array([origin for _, (origin, _) in waiting])
+        unique, inverse = np.unique(origins, return_inverse=True)
+        batches = np.array([self._allocate() for _ in unique])
+        self.batch_counts[batches] = np.bincount(inverse)
+        self.batch_bytes[batches] = np.bincount(inverse, weights=[size for _, (_, size) in waiting])
+        self.batch_hops[batches] = 0
+        for (transaction_id, (_, size)), index in zip(waiting, inverse):
+            self._transactions[transaction_id] = (int(batches[index]), size)
+        self.mempool_sizes[unique] += self.batch_counts[batches]
+        for origin, batch in zip(unique.tolist(), batches.tolist()):
+            tree = self._tree(origin)
+            self.batch_reached[batch] = len(tree.order)
+            if tree.hops == 1:
+                self._finish(batch, tree)
+            else:
+                self._spreading[batch] = tree
+
+    def _spread(self):
+        # The next hop of every spreading batch, gathered into one transfer list
+        links, receivers, lengths, sizes, counts = [], [], [], [], []
+        messages = size = 0
+        for batch, tree in list(self._spreading.items()):
+            hop = self.batch_hops[batch] + 1
+            start, end = tree.offsets[hop], tree.offsets[hop + 1]
+            count = int(self.batch_counts[batch])
+            inv, fetching = int(tree.announcements[hop]), int(end - start)
+            # One INV and one GETDATA per link, with one entry per transaction,
+            # and one TX message per transaction
+            self.inv_messages += inv
+            self.getdata_messages += fetching
+            self.tx_messages += count * fetching
+            messages += inv + fetching + count * fetching
+            size += (inv + fetching) * (MESSAGE_HEADER_BYTES + INV_ENTRY_BYTES * count)
+            links.append(tree.links[start:end])
+            receivers.append(tree.order[start:end])
+            lengths.append(fetching)
+            sizes.append(self.batch_bytes[batch] + MESSAGE_HEADER_BYTES * count)
+            counts.append(count)
+            self.batch_hops[batch] = hop
+            if hop + 1 == tree.hops:
+                del self._spreading[batch]
+                self._finish(batch, tree)
+        links, receivers = np.concatenate(links), np.concatenate(receivers)
+        sizes = np.repeat(sizes, lengths)
+        self.mempool_sizes += np.bincount(receivers, weights=np.repeat(counts, lengths),
+                                          minlength=self.node_count).astype(np.int64)
+
+        size += int(sizes.sum())
+        if self.links is not None:
+            size += PACKET_BYTES * self._send(links, sizes)
+        self.metrics.relay_messages += messages
+        self.metrics.relay_bytes += size
+        self.metrics.io_requests += messages
+        self.metrics.network_data += size / (1024 * 1024)  # MB
+
+    def _send(self, links, sizes) -> int:
+        """Queue the TX messages on their links, one transfer per link; returns the packets lost"""
+        totals = np.bincount(links, weights=sizes, minlength=len(self._sources))
+        used = np.flatnonzero(totals)
+        transmission, _, lost = self.links.transfer_times(used, totals[used], 0.0)
+        self.links.occupy(used, self.env.now, transmission)
+        retransmitted = int(lost.sum())
+        self.metrics.retransmitted_packets += retransmitted
+        return retransmitted
+
+    def _finish(self, batch, tree: RelayTree):
+        if len(tree.order) < self.node_count:
+            self._partial[batch] = tree
+
+    def _holders(self, batch):
+        """Index of the nodes that have batch"""
+        tree = self._spreading.get(batch, self._partial.get(batch))
+        if tree is None:
+            return slice(None)
+        return tree.order[:tree.offsets[self.batch_hops[batch] + 1]]
+
+    def _tree(self, origin) -> RelayTree:
+        tree = self._trees.get(origin)
+        if tree is not None:
+            self._trees.move_to_end(origin)
+            return tree
+        order, predecessors = breadth_first_order(self._matrix, origin, return_predecessors=True)
+        # Parents leave the queue in order, so each hop ends right after the
+        # children of the previous one
+        position = np.empty(self.node_count, dtype=np.int64)
+        position[order] = np.arange(len(order))
+        parents = position[predecessors[order[1:]]]
+        offsets = [0, 1]
+        while offsets[-1] < len(order):
+            offsets.append(1 + int(np.searchsorted(parents, offsets[-1])))
+        hops = np.full(self.node_count, -2)
+        hops[order] = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+        # Every link from a node to one a hop further carries an INV; each
+        # node fetches over the first of them
+        targets = self.graph.indices
+        forward = np.flatnonzero(hops[targets] == hops[self._sources] + 1)
+        announcements = np.bincount(hops[targets[forward]], minlength=len(offsets) - 1)
+        first = np.zeros(self.node_count, dtype=np.int32)
+        first[targets[forward[::-1]]] = forward[::-1]
+        tree = RelayTree(order.astype(np.int32), np.array(offsets), first[order], announcements)
+        self._trees[origin] = tree
+        if len(self._trees) > RELAY_CACHED_TREES:
+            self._trees.popitem(last=False)
+        return tree
+
+    def _allocate(self) -> int:
+        if self.batch_count == len(self.batch_counts):
+            capacity = 2 * len(self.batch_counts)
+            for name in ("batch_counts", "batch_bytes", "batch_hops", "batch_reached"):
+                grown = np.empty(capacity, dtype=np.int64)
+                grown[:self.batch_count] = getattr(self, name)[:self.batch_count]
+                setattr(self, name, grown)
+        self.batch_count += 1
+        return self.batch_count - 1
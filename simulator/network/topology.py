@@ -1,41 +1,249 @@
-import random
-from typing import List
+import numpy as np
+from dataclasses import dataclass
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
+from typing import Dict, List, Optional, Tuple
 from simulator.blockchain.nodes import Node
+from simulator.blockchain.inventory import BlockInventory
+
+STRATEGIES = ["stub", "preferential_attachment", "mesh", "watts_strogatz"]
+# Rewiring probability of watts_strogatz when the scenario gives none
+REWIRING_PROBABILITY = 0.1
+# Rounds of re-pairing before the leftover stubs are dropped
+REPAIR_ROUNDS = 50
+
+@dataclass
+class Graph:
+    """Undirected graph in CSR form: the sorted neighbors of node i are indices[indptr[i]:indptr[i + 1]]"""
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    @classmethod
+    def from_edges(cls, node_count, sources, targets) -> "Graph":
+        # scipy's COO to CSR conversion is a linear-time counting sort
+        matrix = coo_matrix((np.ones(2 * len(sources), dtype=np.int8),
+                             (np.concatenate((sources, targets)), np.concatenate((targets, sources)))),
+                            shape=(node_count, node_count)).tocsr()
+        matrix.sort_indices()
+        return cls(matrix.indptr.astype(np.int64), matrix.indices.astype(np.int32))
+
+    @property
+    def node_count(self):
+        return len(self.indptr) - 1
+
+    @property
+    def edge_count(self):
+        return len(self.indices) // 2
+
+    def neighbors(self, node_id) -> np.ndarray:
+        return self.indices[self.indptr[node_id]:self.indptr[node_id + 1]]
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def component_count(self):
+        return connected_components(self._matrix(), directed=False)[0]
+
+    def _matrix(self):
+        return csr_matrix((np.ones(len(self.indices), dtype=np.int8), self.indices, self.indptr),
+                          shape=(self.node_count, self.node_count))
+
 
 class Network_topology:
     """Network topology management"""
-    
-    def __init__(self):
-        pass
-    
-    def create_network(self, nodes: List[Node], node_count: int, neighbors: int):
-        """Create network topology"""
-        # Create nodes
-        for i in range(node_count):
-            node = Node(node_id=i, neighbors=set())
-            nodes.append(node)
-        
-        # Create connections using stub pairing
-        self._stub_pairing(nodes, neighbors)
-    
-    def _stub_pairing(self, nodes: List[Node], neighbors: int):
-        """Implement stub pairing algorithm"""
-        stubs = []
-        
-        # Create stubs for each node
-        for node in nodes:
-            for _ in range(neighbors):
-                stubs.append(node.node_id)
-        
-        # Randomly pair stubs
-        random.shuffle(stubs)
-        
-        # Connect pairs
-        for i in range(0, len(stubs), 2):
-            if i + 1 < len(stubs):
-                node1_id = stubs[i]
-                node2_id = stubs[i + 1]
-                
-                if node1_id != node2_id:  # Avoid self-connections
-                    nodes[node1_id].neighbors.add(node2_id)
-                    nodes[node2_id].neighbors.add(node1_id)
\ No newline at end of file
+
+    def __init__(self, rng: np.random.Generator = None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.graph: Optional[Graph] = None
+        self.inventory: Optional[BlockInventory] = None
+
+    def create_network(self, nodes: List[Node], node_count: int, neighbors: int,
+                       strategy: str = "stub", scenario: Dict = None) -> Graph:
+        """Create network topology with mean degree neighbors, within the scenario's degree bounds"""
+        scenario = scenario or {}
+        if strategy == "scenario":
+            strategy = scenario.get("connection_strategy", "stub")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown topology strategy: {strategy}")
+        max_degree = max(scenario.get("max_connections", node_count - 1), neighbors)
+
+        # Without scenario bounds, repair only raises nodes to the degree the
+        # generator gives every node, so the mean stays at neighbors
+        if neighbors >= node_count - 1:
+            edges = self._complete(node_count)
+            base_degree = neighbors
+        elif strategy == "stub":
+            edges = self._stub_pairing(node_count, np.repeat(np.arange(node_count), neighbors))
+            base_degree = neighbors
+        elif strategy == "preferential_attachment":
+            base_degree = max(1, neighbors // 2)
+            edges = self._preferential_attachment(node_count, base_degree)
+        else:
+            rewiring = scenario.get("rewiring_probability", REWIRING_PROBABILITY) if strategy == "watts_strogatz" else 0
+            edges = self._watts_strogatz(node_count, neighbors, rewiring)
+            base_degree = neighbors if not rewiring else max(1, neighbors // 2)
+        min_degree = max(1, min(scenario.get("min_connections", base_degree), neighbors))
+
+        # Degree and connectivity repair
+        edges = self._cap_degrees(node_count, edges, max_degree)
+        edges = self._raise_degrees(node_count, edges, min_degree, max_degree)
+        self.graph = self._connect_components(node_count, edges)
+        self._check_degrees(min_degree, max_degree)
+
+        # Create nodes, which share the graph and one block inventory
+        self.inventory = BlockInventory(node_count)
+        nodes.extend(Node(i, self.graph, self.inventory) for i in range(node_count))
+        return self.graph
+
+    def _stub_pairing(self, node_count, stubs: np.ndarray, edges: Tuple[np.ndarray, np.ndarray] = None):
+        """Pair shuffled stubs, re-pairing self-loops and duplicates with as many random good edges"""
+        if edges is None:
+            edges = (_EMPTY, _EMPTY)
+        # The given edges are free of duplicates already
+        known = np.sort(_edge_keys(*edges, node_count))
+        pending = self.rng.permutation(stubs)
+        sources, targets = _EMPTY, _EMPTY
+        for _ in range(REPAIR_ROUNDS):
+            if len(pending) < 2:
+                break
+            pending = pending[:len(pending) // 2 * 2]
+            candidates = (pending[0::2], pending[1::2])
+            bad, good_keys = _screen(_edge_keys(*candidates, node_count), candidates[0] == candidates[1], known)
+            known = _merge_keys(known, good_keys)
+            sources = np.concatenate((sources, candidates[0][~bad]))
+            targets = np.concatenate((targets, candidates[1][~bad]))
+            bad_count = int(bad.sum())
+            if not bad_count:
+                break
+            # Break up as many random good edges to give the bad stubs new partners
+            broken = self.rng.choice(len(sources), size=min(bad_count, len(sources)), replace=False)
+            known = np.delete(known, np.searchsorted(known, _edge_keys(sources[broken], targets[broken], node_count)))
+            pending = self.rng.permutation(np.concatenate(
+                (candidates[0][bad], candidates[1][bad], sources[broken], targets[broken])))
+            sources, targets = np.delete(sources, broken), np.delete(targets, broken)
+        return np.concatenate((edges[0], sources)), np.concatenate((edges[1], targets))
+
+    def _complete(self, node_count):
+        return np.triu_indices(node_count, 1)
+
+    def _preferential_attachment(self, node_count, links):
+        """Barabasi-Albert style growth: node i links to links earlier nodes j, drawn as floor(i * u ** 2)"""
+        seed = min(links + 1, node_count)
+        clique = self._complete(seed)
+        joining = np.repeat(np.arange(seed, node_count), links)
+        targets = (joining * self.rng.random(len(joining)) ** 2).astype(np.int64)
+        bad, known = _screen(_edge_keys(joining, targets, node_count), np.zeros(len(joining), dtype=bool), _EMPTY)
+        for _ in range(REPAIR_ROUNDS):
+            redraw = np.flatnonzero(bad)
+            if not len(redraw):
+                break
+            targets[redraw] = (joining[redraw] * self.rng.random(len(redraw)) ** 2).astype(np.int64)
+            bad[redraw], good_keys = _screen(_edge_keys(joining[redraw], targets[redraw], node_count),
+                                             np.zeros(len(redraw), dtype=bool), known)
+            known = _merge_keys(known, good_keys)
+        return (np.concatenate((clique[0], joining[~bad])),
+                np.concatenate((clique[1], targets[~bad])))
+
+    def _watts_strogatz(self, node_count, neighbors, rewiring):
+        """Ring lattice of degree neighbors with each edge rewired with probability rewiring"""
+        nodes = np.arange(node_count)
+        offsets = np.arange(1, neighbors // 2 + 1)
+        sources = np.repeat(nodes, len(offsets))
+        targets = (sources + np.tile(offsets, node_count)) % node_count
+        if neighbors % 2:
+            half = nodes[:node_count // 2]
+            sources = np.concatenate((sources, half))
+            targets = np.concatenate((targets, half + node_count // 2))
+        lattice = targets.copy()
+        if rewiring:
+            rewired = np.flatnonzero(self.rng.random(len(targets)) < rewiring)
+            targets[rewired] = self.rng.integers(0, node_count, len(rewired))
+        bad, known = _screen(_edge_keys(sources, targets, node_count), sources == targets, _EMPTY)
+        reverted = np.flatnonzero(bad & (targets != lattice))
+        if len(reverted):
+            targets[reverted] = lattice[reverted]
+            bad[reverted], _ = _screen(_edge_keys(sources[reverted], targets[reverted], node_count),
+                                       sources[reverted] == targets[reverted], known)
+        return sources[~bad], targets[~bad]
+
+    def _cap_degrees(self, node_count, edges, max_degree):
+        """Drop random edges of the nodes above max_degree"""
+        sources, targets = edges
+        degrees = np.bincount(np.concatenate(edges), minlength=node_count)
+        over = degrees > max_degree
+        if not over.any():
+            return edges
+        # All edges of the overloaded nodes, in random order; each keeps its
+        # first max_degree and the edges after them are dropped
+        touching = self.rng.permutation(np.flatnonzero(over[sources] | over[targets]))
+        endpoints = np.concatenate((sources[touching], targets[touching]))
+        order = np.argsort(endpoints, kind="stable")
+        sorted_endpoints = endpoints[order]
+        rank = np.empty(len(endpoints), dtype=np.int64)
+        rank[order] = np.arange(len(endpoints)) - np.searchsorted(sorted_endpoints, sorted_endpoints)
+        dropped = ((rank >= max_degree) & over[endpoints]).reshape(2, -1).any(axis=0)
+        keep = np.ones(len(sources), dtype=bool)
+        keep[touching[dropped]] = False
+        return sources[keep], targets[keep]
+
+    def _raise_degrees(self, node_count, edges, min_degree, max_degree):
+        """Pair extra stubs for the nodes below min_degree"""
+        degrees = np.bincount(np.concatenate(edges), minlength=node_count)
+        missing = np.maximum(min_degree - degrees, 0)
+        if not missing.any():
+            return edges
+        stubs = np.repeat(np.arange(node_count), missing)
+        # Partners for the stubs that cannot pair among themselves, at most
+        # one extra link for each node with room below max_degree
+        room = np.flatnonzero(degrees + missing < max_degree)
+        if len(room):
+            partners = self.rng.choice(room, size=len(stubs), replace=len(stubs) > len(room))
+            stubs = np.concatenate((stubs, partners))
+        return self._stub_pairing(node_count, stubs, edges)
+
+    def _connect_components(self, node_count, edges) -> Graph:
+        """Graph of the edges, with a random node of every smaller component linked to the largest one"""
+        graph = Graph.from_edges(node_count, *edges)
+        count, labels = connected_components(graph._matrix(), directed=False)
+        if count == 1:
+            return graph
+        largest = np.argmax(np.bincount(labels))
+        order = self.rng.permutation(node_count)
+        # First node of each component in random order
+        labels_in_order = labels[order]
+        _, first = np.unique(labels_in_order, return_index=True)
+        representatives = order[first]
+        representatives = representatives[labels[representatives] != largest]
+        anchors = self.rng.choice(np.flatnonzero(labels == largest), size=len(representatives))
+        return Graph.from_edges(node_count, np.concatenate((edges[0], representatives)),
+                                np.concatenate((edges[1], anchors)))
+
+    def _check_degrees(self, min_degree, max_degree):
+        degrees = self.graph.degrees()
+        outside = int(((degrees < min_degree) | (degrees > max_degree)).sum())
+        if outside:
+            print(f"Topology: {outside} of {self.graph.node_count} nodes have a degree outside "
+                  f"{min_degree}..{max_degree} after repair")
+
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+def _edge_keys(sources, targets, node_count) -> np.ndarray:
+    """One int64 key per undirected edge"""
+    return np.minimum(sources, targets).astype(np.int64) * node_count + np.maximum(sources, targets)
+
+def _screen(keys, self_loops, known) -> Tuple[np.ndarray, np.ndarray]:
+    """Mask of the self-loops, repeats and keys already in (sorted) known, and the sorted good keys"""
+    unique, first = np.unique(keys, return_index=True)
+    bad = np.ones(len(keys), dtype=bool)
+    bad[first] = False
+    bad |= self_loops
+    if len(known) and len(keys):
+        positions = np.minimum(np.searchsorted(known, keys), len(known) - 1)
+        bad |= known[positions] == keys
+    return bad, unique[~bad[first]]
+
+def _merge_keys(known, keys) -> np.ndarray:
+    if not len(known):
+        return keys
+    return np.insert(known, np.searchsorted(known, keys), keys)
@@ -1,16 +1,17 @@
 import simpy
-import random
 from typing import List
 from simulator.blockchain.miner import Miner
-from simulator.blockchain.wallet import Wallet
-from simulator.core.metrics import SimulationMetrics
+from simulator.blockchain.ledger import Ledger
+from simulator.core.rng import RandomService
+from simulator.core.metrics import RETARGET_WINDOW, RollingWindow, SimulationMetrics, format_inflation, format_quantiles
 
 class MiningProcessManager:
     """Manages mining processes for block creation"""
     
-    def __init__(self, env: simpy.Environment, config):
+    def __init__(self, env: simpy.Environment, config, rng: RandomService = None):
         self.env = env
         self.config = config
+        self.rng = rng if rng is not None else RandomService()
     
     def create_miners(self, miner_count: int, config) -> List[Miner]:
         """Create miner instances"""
@@ -26,7 +27,7 @@ class MiningProcessManager:
             miners.append(miner)
         return miners
     
-    def mining_process(self, miner, wallets, transaction_pool, blocks, metrics, network_simulator):
+    def mining_process(self, miner, ledger: Ledger, transaction_pool, blocks, metrics):
         """SimPy process for mining blocks with proper exponential distribution"""
         block_id = 1
         parent_block_id = 0
@@ -35,20 +36,14 @@ class MiningProcessManager:
         blocks_since_halving = 0
         current_reward = miner.reward
         current_difficulty = self.config.difficulty
-        
-        # Create wallets dictionary including miner wallet
-        wallets_dict = {wallet.wallet_id: wallet for wallet in wallets}
-        wallets_dict[f"miner_{miner.miner_id}"] = Wallet(
-            wallet_id=f"miner_{miner.miner_id}",
-            balance=0.0
-        )
+        stream = self.rng.stream(f"miner{miner.miner_id}")
         
         while len(blocks) < self.config.blocks:
             # Calculate mining time using exponential distribution
             # Expected time per block ∼ Exp(total_hashrate / difficulty)
             total_hashrate = self.config.miners * self.config.hashrate
             rate = total_hashrate / current_difficulty
-            mining_time = random.expovariate(rate)
+            mining_time = stream.exponential(rate)
             
             # Wait for mining time
             yield self.env.timeout(mining_time)
@@ -57,37 +52,34 @@ class MiningProcessManager:
             time_since_last = current_time - last_block_time
             
             # Mine block
-            block, included_tx_ids = miner.mine_block(
+            block, included = miner.mine_block(
                 parent_block_id=parent_block_id,
                 pool=transaction_pool,
                 block_id=block_id,
                 timestamp=int(current_time),
                 blocksize=self.config.blocksize,
-                wallets_dict=wallets_dict
+                ledger=ledger,
+                max_bytes=self.config.blockbytes,
+                headers_only=self.config.blockmode == "headers"
             )
             
             # Update block timing
             block.header.time_since_last_block = time_since_last
             blocks.append(block)
-            metrics.block_times.append(time_since_last)
-            metrics.coin_supply += current_reward
-            metrics.confirmed_transactions += len(included_tx_ids)
-            metrics.pending_transactions -= len(included_tx_ids)
-            
-            # Block propagation through network
-            if hasattr(network_simulator, 'propagate_block'):
-                delay = network_simulator.propagate_block(block, miner.miner_id, [], metrics)
-                if delay > 0:
-                    yield self.env.timeout(delay)
+            metrics.record_block(time_since_last, current_reward)
+            metrics.confirmed_transactions += len(included)
+            metrics.pending_transactions -= len(included)
+            metrics.record_confirmations(current_time, included)
             
             # Remove confirmed transactions from pool
-            transaction_pool.remove_confirmed_transaction(set(included_tx_ids))
+            transaction_pool.remove_confirmed_transaction({tx.transaction_id for tx in included})
+            metrics.pool_sizes.add(transaction_pool.get_pool_size())
             
             # Difficulty adjustment every 2016 blocks
             blocks_since_retarget += 1
-            if blocks_since_retarget >= 2016:
+            if blocks_since_retarget >= RETARGET_WINDOW:
                 current_difficulty = self._adjust_difficulty(
-                    current_difficulty, metrics.block_times[-2016:], self.config.blocktime
+                    current_difficulty, metrics.block_window, self.config.blocktime
                 )
                 blocks_since_retarget = 0
                 metrics.difficulty_adjustments += 1
@@ -112,13 +104,13 @@ class MiningProcessManager:
             parent_block_id = block_id
             block_id += 1
     
-    def _adjust_difficulty(self, old_difficulty: int, recent_block_times: List[float], target_blocktime: int) -> int:
+    def _adjust_difficulty(self, old_difficulty: int, block_window: RollingWindow, target_blocktime: int) -> int:
         """Adjust difficulty based on actual vs target block time"""
-        if len(recent_block_times) < 2016:
+        if not block_window.is_full():
             return old_difficulty
         
-        actual_time = sum(recent_block_times)
-        target_time = target_blocktime * 2016
+        actual_time = block_window.total
+        target_time = target_blocktime * RETARGET_WINDOW
         
         new_difficulty = int(old_difficulty * (target_time / actual_time))
         return max(1, new_difficulty)
@@ -136,9 +128,12 @@ class MiningProcessManager:
         
         print(f"[{current_time:.2f}] Sum B:{blocks_completed}/{self.config.blocks} "
               f"{completion_pct:.1f}% abt:{avg_block_time:.2f}s tps:{tps:.2f} "
-              f"infl:{inflation:.2f}% ETA:{eta:.2f}s "
+              f"infl:{format_inflation(inflation)} ETA:{eta:.2f}s "
               f"Diff:{difficulty/1000000:.1f}M "
               f"H:{self.config.miners * self.config.hashrate/1000000:.0f}M "
               f"Tx:{metrics.total_transactions} C:{metrics.coin_supply:.0f} "
               f"Pool:{metrics.pending_transactions} "
-              f"NMB:{metrics.network_data:.2f} IO:{metrics.io_requests}")
\ No newline at end of file
+              f"NMB:{metrics.network_data:.2f} IO:{metrics.io_requests} "
+              f"CL:{format_quantiles(metrics.confirmation_latency)}s "
+              f"BI:{format_quantiles(metrics.block_intervals)}s "
+              f"PS:{format_quantiles(metrics.pool_sizes, 0)}")
\ No newline at end of file
@@ -1,48 +1,128 @@
 import simpy
+import math
 from typing import List
 from simulator.blockchain.wallet import Wallet
+from simulator.blockchain.ledger import Ledger
+from simulator.blockchain.ids import transaction_id
+from simulator.blockchain.transaction import transaction_size_sampler
 from simulator.blockchain.transaction_pool import Transaction_pool
 from simulator.core.metrics import SimulationMetrics
+from simulator.core.workload import WorkloadGenerator
+from simulator.core.rng import RandomService
 
 class WalletProcessManager:
     """Manages wallet processes for transaction generation"""
     
-    def __init__(self, env: simpy.Environment, config):
+    def __init__(self, env: simpy.Environment, config, rng: RandomService = None):
         self.env = env
         self.config = config
+        self.rng = rng if rng is not None else RandomService()
+        self.random = self.rng.stream("wallets")
+        self.draw_tx_size = transaction_size_sampler(config.txsizes, config.txsize, self.random.random)
     
-    def create_wallets(self, wallet_count: int) -> List[Wallet]:
-        """Create wallet instances with starting balance"""
+    def create_wallets(self, ledger: Ledger) -> List[Wallet]:
+        """Create wallet instances over the ledger's wallet accounts"""
         wallets = []
-        for i in range(wallet_count):
+        for i in range(ledger.wallet_count):
             wallet = Wallet(
                 wallet_id=i,
-                balance=1000.0  # Starting balance for transactions
+                ledger=ledger
             )
             wallets.append(wallet)
         return wallets
     
     def wallet_process(self, wallet: Wallet, transaction_pool: Transaction_pool, metrics: SimulationMetrics):
         """SimPy process for wallet transaction generation"""
-        for tx_num in range(self.config.transactions):
-            # Generate transaction to next wallet (round-robin)
-            receiver = (wallet.wallet_id + 1) % self.config.wallets
-            tx_id = f"{wallet.wallet_id}-{tx_num}"
+        tx_num = 0
+        while tx_num < self.config.transactions:
+            if self.send_transaction(wallet, tx_num, transaction_pool, metrics):
+                tx_num += 1
+                # Wait for transaction interval
+                yield self.env.timeout(self.config.interval)
+                continue
             
-            try:
-                wallet.send_transaction(
-                    receiver=receiver,
-                    amount=1.0,
-                    fee=0.01,
-                    pool=transaction_pool,
-                    timestamp=int(self.env.now),
-                    transaction_id=tx_id
-                )
-                metrics.total_transactions += 1
-                metrics.pending_transactions += 1
-            except ValueError:
-                # Insufficient balance - skip transaction
-                pass
-            
-            # Wait for transaction interval
-            yield self.env.timeout(self.config.interval)
\ No newline at end of file
+            # Broke: sleep until a payment or refund arrives instead of
+            # waking every interval; the slots that pass meanwhile are skipped
+            yield wallet.park(self.env.event())
+            next_num = max(tx_num + 1, math.ceil(self.env.now / self.config.interval))
+            metrics.skipped_transactions += min(next_num, self.config.transactions) - tx_num - 1
+            tx_num = next_num
+            if tx_num < self.config.transactions:
+                yield self.env.timeout(tx_num * self.config.interval - self.env.now)
+    
+    def aggregated_wallet_process(self, wallets: List[Wallet], transaction_pool: Transaction_pool, metrics: SimulationMetrics):
+        """One SimPy process generating the transactions of all wallets.
+
+        Transactions are drawn by the WorkloadGenerator in vectorized chunks
+        and sent in time order, one timeout per distinct send time. With the
+        default workload this produces the same per-wallet streams as one
+        wallet_process per wallet.
+        """
+        generator = WorkloadGenerator(self.config, rng=self.rng.generator("workload"))
+        parked = wallets[0].ledger.parked if wallets else None
+        for batch in generator.batches():
+            times = batch.times.tolist()
+            senders = batch.senders.tolist()
+            tx_nums = batch.tx_nums.tolist()
+            receivers = batch.receivers.tolist()
+            amounts = batch.amounts.tolist()
+            fees = batch.fees.tolist()
+            sizes = batch.sizes.tolist()
+            chained = batch.chained.tolist()
+            for i in range(len(times)):
+                if times[i] > self.env.now:
+                    yield self.env.timeout(times[i] - self.env.now)
+                if parked[senders[i]]:
+                    # Parked until a payment or refund arrives
+                    metrics.skipped_transactions += 1
+                    continue
+                wallet = wallets[senders[i]]
+                if not self.submit_transaction(
+                        wallet, tx_nums[i], receivers[i], amounts[i],
+                        fees[i], sizes[i], chained[i], transaction_pool, metrics):
+                    wallet.park(self.env.event())
+    
+    def send_transaction(self, wallet: Wallet, tx_num: int, transaction_pool: Transaction_pool, metrics: SimulationMetrics):
+        """Send a wallet's tx_num-th transaction to the next wallet.
+
+        Returns False when the wallet cannot afford it.
+        """
+        # Generate transaction to next wallet (round-robin)
+        receiver = (wallet.wallet_id + 1) % self.config.wallets
+        chained = bool(self.config.chaining) and self.random.random() < self.config.chaining
+        return self.submit_transaction(
+            wallet, tx_num, receiver, self.config.amount, self.config.fee,
+            self.draw_tx_size(), chained, transaction_pool, metrics
+        )
+    
+    def submit_transaction(self, wallet: Wallet, tx_num: int, receiver: int, amount: float, fee: float,
+                           size: int, chained: bool, transaction_pool: Transaction_pool, metrics: SimulationMetrics):
+        """Submit a drawn transaction; returns False if the wallet cannot afford it"""
+        tx_id = transaction_id(wallet.wallet_id, tx_num)
+        if self.config.feetarget:
+            # Outbid the pool for confirmation within feetarget blocks
+            fee = max(fee, transaction_pool.estimate_fee(self.config.feetarget) * size)
+        parent_id = None
+        if chained and wallet.transaction_history and not self.config.utxos:
+            # Accounts confirm their transactions in nonce order, so this one
+            # waits for the previous, which may still be pending; the pool
+            # mines them as one package. UTXO wallets spend confirmed coins
+            # only, so their transactions never have a parent.
+            parent_id = wallet.transaction_history[-1]
+        
+        if not wallet.can_afford(amount, fee):
+            metrics.skipped_transactions += 1
+            return False
+        wallet.send_transaction(
+            receiver=receiver,
+            amount=amount,
+            fee=fee,
+            pool=transaction_pool,
+            timestamp=int(self.env.now),
+            transaction_id=tx_id,
+            size=size,
+            parent_id=parent_id
+        )
+        metrics.total_transactions += 1
+        metrics.pending_transactions += 1
+        return True
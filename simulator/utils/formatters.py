@@ -1,3 +1,5 @@
+from simulator.core.metrics import format_inflation
+
 def format_number(num: float, suffix: str = "") -> str:
     """Format numbers with appropriate suffixes"""
     if num >= 1e6:
@@ -20,7 +22,7 @@ def format_simulation_output(metrics, current_time: float, config) -> str:
     
     return (f"[{current_time:.2f}] Sum B:{blocks_completed}/{config.blocks} "
             f"{completion_pct:.1f}% abt:{avg_block_time:.2f}s tps:{tps:.2f} "
-            f"infl:{inflation:.2f}% ETA:{eta:.2f}s "
+            f"infl:{format_inflation(inflation)} ETA:{eta:.2f}s "
             f"Diff:{format_number(config.difficulty)} "
             f"H:{format_number(config.miners * config.hashrate)} "
             f"Tx:{metrics.total_transactions} C:{format_number(metrics.coin_supply)} "
@@ -0,0 +1,45 @@
+import numpy as np
+
+from simulator.blockchain.inventory import WINDOW_BITS, BlockInventory
+
+
+def test_in_order_blocks_advance_the_high_water_mark():
+    inventory = BlockInventory(2)
+    for block_id in range(1, 6):
+        assert inventory.receive(0, block_id)
+    assert not inventory.receive(0, 3)
+    assert inventory.high_water[0] == 5 and inventory.window[0] == 0
+    assert inventory.has_block(0, 5) and not inventory.has_block(0, 6)
+    assert not inventory.has_block(1, 1)
+
+
+def test_out_of_order_blocks_fill_the_window():
+    inventory = BlockInventory(1)
+    assert inventory.receive(0, 3)
+    assert inventory.has_block(0, 3) and not inventory.has_block(0, 1)
+    assert inventory.receive(0, 1)
+    assert inventory.high_water[0] == 1
+    assert inventory.receive(0, 2)
+    assert inventory.high_water[0] == 3 and inventory.window[0] == 0
+
+
+def test_far_ahead_block_slides_the_window():
+    inventory = BlockInventory(1)
+    inventory.receive(0, 2)
+    block_id = 10 + WINDOW_BITS
+    assert inventory.receive(0, block_id)
+    # Ids sliding out of the window count as received
+    assert inventory.has_block(0, 1) and inventory.has_block(0, block_id)
+    assert not inventory.has_block(0, block_id - 1)
+
+
+def test_receive_many_matches_receive():
+    rng = np.random.default_rng(1)
+    scalar, vector = BlockInventory(50), BlockInventory(50)
+    for block_id in rng.integers(1, 3 * WINDOW_BITS, 300):
+        nodes = rng.choice(50, size=20, replace=False)
+        fresh = vector.receive_many(nodes, int(block_id))
+        expected = [scalar.receive(int(node), int(block_id)) for node in nodes]
+        assert fresh.tolist() == expected
+    assert np.array_equal(scalar.high_water, vector.high_water)
+    assert np.array_equal(scalar.window, vector.window)
@@ -0,0 +1,74 @@
+import simpy
+
+from simulator.blockchain.ids import miner_account, transaction_id
+from simulator.blockchain.ledger import Ledger
+from simulator.blockchain.transaction import Transaction
+
+
+def make_transaction(sender, receiver, amount, fee, sequence=0):
+    return Transaction(transaction_id=transaction_id(sender, sequence), sender=sender, receiver=receiver,
+                       amount=amount, timestamp=0, fee=fee, size=250)
+
+
+def test_debit_refund_and_credit():
+    ledger = Ledger(wallet_count=2, miner_count=1, starting_balance=10.0)
+    transaction = make_transaction(0, 1, amount=3.0, fee=0.5)
+    assert ledger.debit(0, transaction.amount, transaction.fee) is None
+    assert ledger.balances[0] == 6.5
+    assert ledger.fees_paid[0] == 0.5
+    assert ledger.nonces[0] == 1
+
+    ledger.refund(0, transaction)
+    assert ledger.balances[0] == 10.0
+    assert ledger.fees_paid[0] == 0.0
+    ledger.credit(1, 2.0)
+    assert ledger.balances.tolist() == [10.0, 12.0, 0.0]
+
+
+def test_apply_block_pays_receivers_and_miner():
+    ledger = Ledger(wallet_count=3, miner_count=2, starting_balance=10.0)
+    transactions = [make_transaction(0, 1, amount=2.0, fee=0.25), make_transaction(2, 1, amount=1.0, fee=0.5),
+                    make_transaction(1, 0, amount=4.0, fee=0.25)]
+    for transaction in transactions:
+        ledger.debit(ledger.slot(transaction.sender), transaction.amount, transaction.fee)
+
+    assert ledger.apply_block(transactions, miner_account(1), reward=50.0) == 1.0
+    # Wallet 1 got two payments in the same block
+    assert ledger.balances[:3].tolist() == [11.75, 8.75, 8.5]
+    assert ledger.slot(miner_account(1)) == 4
+    assert ledger.miner_balances().tolist() == [0.0, 51.0]
+
+
+def test_miner_balance_carries_over_blocks():
+    ledger = Ledger(wallet_count=2, miner_count=1, starting_balance=10.0)
+    miner = miner_account(0)
+    ledger.apply_block([make_transaction(0, 1, amount=1.0, fee=0.5)], miner, reward=50.0)
+    ledger.apply_block([], miner, reward=25.0)
+    ledger.apply_block([make_transaction(1, 0, amount=1.0, fee=0.25, sequence=1)], miner, reward=25.0)
+    assert ledger.miner_balances().tolist() == [100.75]
+
+
+def test_parked_wallet_wakes_on_payment():
+    env = simpy.Environment()
+    ledger = Ledger(wallet_count=2, miner_count=1)
+    event = ledger.park(0, env.event())
+    assert ledger.parked[0] and ledger.parked_count() == 1
+
+    # A block paying another wallet leaves it parked
+    ledger.apply_block([make_transaction(1, 1, amount=1.0, fee=0.0)], miner_account(0), reward=50.0)
+    assert not event.triggered
+    ledger.apply_block([make_transaction(1, 0, amount=1.0, fee=0.0, sequence=1)], miner_account(0), reward=50.0)
+    assert event.triggered
+    assert not ledger.parked[0] and ledger.parked_count() == 0
+    assert ledger.balances[0] == 1.0
+
+
+def test_parked_wallet_wakes_on_refund():
+    env = simpy.Environment()
+    ledger = Ledger(wallet_count=1, miner_count=1, starting_balance=1.0)
+    transaction = make_transaction(0, 0, amount=0.75, fee=0.25)
+    ledger.debit(0, transaction.amount, transaction.fee)
+    event = ledger.park(0, env.event())
+    ledger.refund(0, transaction)
+    assert event.triggered
+    assert ledger.balances[0] == 1.0
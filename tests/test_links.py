@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from simulator.network.links import PACKET_BYTES, LinkQueues
+from simulator.network.topology import Graph
+
+
+def star(leaves):
+    # Node 0 linked to nodes 1..leaves
+    return Graph.from_edges(leaves + 1, np.zeros(leaves, dtype=np.int64), np.arange(1, leaves + 1))
+
+def make_links(graph, uplink=1e6, loss=0.0):
+    node_count = graph.node_count
+    return LinkQueues(graph, np.full(node_count, uplink), np.full(node_count, loss), np.random.default_rng(1))
+
+
+def test_transfers_run_at_the_uplink_share():
+    links = make_links(star(4))
+    link = links.link_index([0], [1])
+    transmission, recovery, lost = links.transfer_times(link, 100000, 0.05)
+    # The hub's 1 MB/s uplink is split over its four links
+    assert transmission[0] == 100000 / 250000
+    assert recovery[0] == 0.0 and lost[0] == 0
+
+
+def test_next_free_advances_by_the_transmission_time():
+    links = make_links(star(4))
+    link = links.link_index([0], [1])
+    transmission, _, _ = links.transfer_times(link, 100000, 0.0)
+    links.occupy(link, 2.0, transmission)
+    assert links.next_free[link[0]] == 2.0 + transmission[0]
+    assert links.waits(2.1)[link[0]] == pytest.approx(transmission[0] - 0.1)
+
+    # A second transfer queues behind the first; the hub's other links stay free
+    second, _, _ = links.transfer_times(link, 50000, 0.0)
+    links.occupy(link, 2.0, second)
+    assert links.next_free[link[0]] == 2.0 + transmission[0] + second[0]
+    others = links.link_index([0, 0, 0], [2, 3, 4])
+    assert not links.next_free[others].any()
+
+
+def test_lost_packets_are_sent_again():
+    links = make_links(star(1), loss=0.5)
+    transmission, recovery, lost = links.transfer_times(np.zeros(200, dtype=np.int64), 100 * PACKET_BYTES, 0.05)
+    assert lost.min() > 0
+    assert np.allclose(transmission, (100 + lost) * PACKET_BYTES / 1e6)
+    assert (recovery == 0.1).all()
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from simulator.blockchain.ids import outpoint, transaction_id
+from simulator.blockchain.utxo import MIN_INDEX_CAPACITY, OutpointIndex
+
+
+def outpoints(count, start=0):
+    return np.array([outpoint(transaction_id(wallet, 0), 0) for wallet in range(start, start + count)],
+                    dtype=np.uint64)
+
+
+def test_insert_lookup_remove():
+    index = OutpointIndex()
+    keys = outpoints(100)
+    index.insert(keys, np.arange(100))
+    assert len(index) == 100
+    assert np.array_equal(index.lookup(keys), np.arange(100))
+    assert np.array_equal(index.lookup(outpoints(5, start=100)), np.full(5, -1))
+
+    assert np.array_equal(index.remove(keys[:10]), np.arange(10))
+    assert len(index) == 90
+    assert np.array_equal(index.lookup(keys[:10]), np.full(10, -1))
+    assert np.array_equal(index.lookup(keys[10:]), np.arange(10, 100))
+
+
+def test_remove_unknown_raises():
+    index = OutpointIndex()
+    index.insert(outpoints(3), np.arange(3))
+    with pytest.raises(KeyError):
+        index.remove(outpoints(1, start=3))
+
+
+def test_tombstones_are_reused_and_resizing_keeps_rows():
+    index = OutpointIndex()
+    rows = np.arange(MIN_INDEX_CAPACITY)
+    keys = outpoints(MIN_INDEX_CAPACITY)
+    # Churn through the same slots, then grow past the initial capacity
+    for _ in range(5):
+        index.insert(keys[:200], rows[:200])
+        index.remove(keys[:200])
+    index.insert(keys, rows)
+    assert index.capacity > MIN_INDEX_CAPACITY
+    assert len(index) == MIN_INDEX_CAPACITY
+    assert np.array_equal(index.lookup(keys), rows)
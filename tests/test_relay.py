@@ -0,0 +1,89 @@
+import numpy as np
+import simpy
+
+from simulator.blockchain.ids import transaction_id
+from simulator.blockchain.transaction import Transaction
+from simulator.core.metrics import SimulationMetrics
+from simulator.network.relay import INV_ENTRY_BYTES, MESSAGE_HEADER_BYTES, TransactionRelay
+from simulator.network.topology import Graph, Network_topology
+
+
+def ring(node_count):
+    nodes = np.arange(node_count)
+    return Graph.from_edges(node_count, nodes, (nodes + 1) % node_count)
+
+def make_transaction(wallet, size, sequence=0):
+    return Transaction(transaction_id=transaction_id(wallet, sequence), sender=wallet, receiver=wallet + 1,
+                       amount=1.0, timestamp=0, fee=0.001, size=size)
+
+def make_relay(graph):
+    env = simpy.Environment()
+    metrics = SimulationMetrics()
+    return env, metrics, TransactionRelay(env, graph, metrics, trickle=0.5)
+
+
+def test_exact_message_counts_on_a_ring():
+    env, metrics, relay = make_relay(ring(6))
+    relay.submit(make_transaction(0, 100))
+    env.run()
+    # Hops from node 0 are 0, 1, 2, 3, 2, 1: the INVs run 0->1, 0->5,
+    # 1->2, 5->4, 2->3 and 4->3, and each of the other nodes fetches once
+    assert relay.inv_messages == 6
+    assert relay.getdata_messages == 5
+    assert relay.tx_messages == 5
+    assert metrics.relay_messages == 16
+    entry = MESSAGE_HEADER_BYTES + INV_ENTRY_BYTES
+    assert metrics.relay_bytes == 11 * entry + 5 * (MESSAGE_HEADER_BYTES + 100)
+    assert relay.mempool_sizes.tolist() == [1] * 6
+
+
+def test_batches_of_one_tick_spread_from_their_own_origins():
+    env, metrics, relay = make_relay(ring(20))
+    small, large = make_transaction(0, 1000), make_transaction(10, 5000)
+    relay.submit(small)
+    relay.submit(large)
+    # Batches start at 0.5; one hop later only the origins' neighbors have them
+    env.run(until=1.01)
+    assert relay.batch_count == 2
+    assert relay.batch_bytes[:2].tolist() == [1000, 5000]
+    assert relay.knows(1, small.transaction_id)
+    assert not relay.knows(1, large.transaction_id)
+    assert relay.knows(11, large.transaction_id)
+    assert relay.mempool_sizes[[0, 1, 2, 10, 11]].tolist() == [1, 1, 0, 1, 1]
+
+    env.run()
+    assert relay.tx_messages == 2 * 19
+    # Each node got each transaction in one TX message, on top of INV and GETDATA
+    tx_bytes = 19 * (2 * MESSAGE_HEADER_BYTES + 6000)
+    assert metrics.relay_bytes == tx_bytes + (2 * 20 + 2 * 19) * (MESSAGE_HEADER_BYTES + INV_ENTRY_BYTES)
+    assert relay.mempool_sizes.tolist() == [2] * 20
+
+
+def test_forget_clears_mempools_and_stops_spreading():
+    env, metrics, relay = make_relay(ring(20))
+    first, second = make_transaction(0, 250), make_transaction(0, 300, sequence=1)
+    relay.submit(first)
+    relay.submit(second)
+    env.run(until=1.01)
+    relay.forget([first.transaction_id])
+    assert relay.mempool_sizes[[19, 0, 1, 2]].tolist() == [1, 1, 1, 0]
+    env.run()
+    assert relay.mempool_sizes.tolist() == [1] * 20
+    assert not relay.knows(5, first.transaction_id)
+    assert relay.knows(5, second.transaction_id)
+
+
+def test_relay_reaches_every_node_once():
+    env = simpy.Environment()
+    graph = Network_topology(np.random.default_rng(1)).create_network([], 500, 8)
+    metrics = SimulationMetrics()
+    relay = TransactionRelay(env, graph, metrics, trickle=0.5)
+    relay.submit(make_transaction(3, 250))
+    relay.submit(make_transaction(42, 300))
+    env.run()
+    assert relay.batch_count == 2
+    assert relay.coverage() == 1.0
+    assert relay.getdata_messages == relay.tx_messages == 2 * 499
+    # Every link that reaches a node a hop further from the origin carries an INV
+    assert 2 * 499 <= relay.inv_messages <= 2 * graph.edge_count * 2
+    assert relay.mempool_sizes.tolist() == [2] * 500
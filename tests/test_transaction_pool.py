@@ -0,0 +1,106 @@
+from simulator.blockchain.ids import transaction_id
+from simulator.blockchain.transaction import Transaction
+from simulator.blockchain.transaction_pool import Transaction_pool
+
+
+def make_transaction(wallet, sequence, fee, size=250, timestamp=0, parent_id=None):
+    return Transaction(transaction_id=transaction_id(wallet, sequence), sender=wallet, receiver=wallet + 1,
+                       amount=1.0, timestamp=timestamp, fee=fee, size=size, parent_id=parent_id)
+
+def ids(transactions):
+    return [transaction.transaction_id for transaction in transactions]
+
+def assert_histogram_matches(pool):
+    assert sum(pool.fee_histogram.counts) == pool.get_pool_size()
+    assert sum(pool.fee_histogram.sizes) == pool.get_pool_bytes()
+
+
+def test_child_pays_for_parent():
+    pool = Transaction_pool()
+    parent = make_transaction(1, 0, fee=0.0001)
+    child = make_transaction(1, 1, fee=0.01, parent_id=parent.transaction_id)
+    other = make_transaction(2, 0, fee=0.001)
+    for transaction in (parent, other, child):
+        pool.add_transaction(transaction)
+    # The parent's package outbids the independent transaction
+    assert ids(pool.get_transactions_by_priority(3)) == ids([parent, child, other])
+
+
+def test_parent_with_id_zero_is_mined_first():
+    pool = Transaction_pool()
+    parent = make_transaction(0, 0, fee=0.0001)
+    child = make_transaction(0, 1, fee=0.01, parent_id=parent.transaction_id)
+    assert parent.transaction_id == 0
+    pool.add_transaction(parent)
+    pool.add_transaction(child)
+    # The package does not fit one slot, and the child never goes alone
+    assert pool.get_transactions_by_priority(1) == []
+    assert ids(pool.get_transactions_by_priority(2)) == ids([parent, child])
+    assert pool.get_pool_size() == 0
+
+
+def test_second_child_waits_for_its_parent():
+    pool = Transaction_pool()
+    parent = make_transaction(0, 0, fee=0.0001)
+    first_child = make_transaction(0, 1, fee=0.0001, parent_id=parent.transaction_id)
+    second_child = make_transaction(3, 0, fee=0.01, parent_id=parent.transaction_id)
+    for transaction in (parent, first_child, second_child):
+        pool.add_transaction(transaction)
+    selected = ids(pool.get_transactions_by_priority(3))
+    assert selected.index(parent.transaction_id) < selected.index(second_child.transaction_id)
+    assert selected.index(parent.transaction_id) < selected.index(first_child.transaction_id)
+
+
+def test_eviction_drops_descendants():
+    dropped = []
+    pool = Transaction_pool(max_count=3, on_drop=lambda transaction, reason: dropped.append((transaction, reason)))
+    parent = make_transaction(1, 0, fee=0.0001)
+    child = make_transaction(1, 1, fee=0.0002, parent_id=parent.transaction_id)
+    # Spends the same parent, so it is a separate chain depending on it
+    dependent = make_transaction(2, 0, fee=0.01, parent_id=parent.transaction_id)
+    for transaction in (parent, child, dependent):
+        pool.add_transaction(transaction)
+    assert pool.get_pool_size() == 3
+
+    newcomer = make_transaction(3, 0, fee=0.01)
+    pool.add_transaction(newcomer)
+    assert list(pool.transactions) == [newcomer.transaction_id]
+    assert sorted(ids(transaction for transaction, _ in dropped)) == sorted(ids([parent, child, dependent]))
+    assert {reason for _, reason in dropped} == {"evicted"}
+    assert pool.evicted_count == 3
+    assert_histogram_matches(pool)
+
+
+def test_expiry_drops_descendants():
+    dropped = []
+    pool = Transaction_pool(expiry=10, on_drop=lambda transaction, reason: dropped.append(transaction))
+    parent = make_transaction(1, 0, fee=0.001, timestamp=0)
+    child = make_transaction(1, 1, fee=0.001, timestamp=8, parent_id=parent.transaction_id)
+    fresh = make_transaction(2, 0, fee=0.001, timestamp=8)
+    for transaction in (parent, child, fresh):
+        pool.add_transaction(transaction)
+
+    pool.expire(11)
+    # The child is younger than expiry but cannot confirm without its parent
+    assert list(pool.transactions) == [fresh.transaction_id]
+    assert sorted(ids(dropped)) == sorted(ids([parent, child]))
+    assert pool.expired_count == 2
+    assert_histogram_matches(pool)
+
+
+def test_histogram_tracks_pool():
+    pool = Transaction_pool(max_count=40)
+    parents = []
+    for wallet in range(30):
+        parent = make_transaction(wallet, 0, fee=0.0001 * (wallet + 1), size=200 + wallet)
+        pool.add_transaction(parent)
+        parents.append(parent)
+        if wallet % 2:
+            pool.add_transaction(make_transaction(wallet, 1, fee=0.003, parent_id=parent.transaction_id))
+        assert_histogram_matches(pool)
+
+    pool.get_transactions_by_priority(10)
+    assert_histogram_matches(pool)
+    pool.remove_confirmed_transaction({parents[0].transaction_id, parents[1].transaction_id})
+    assert_histogram_matches(pool)
+    assert not set(ids(parents[:2])) & set(pool.transactions)